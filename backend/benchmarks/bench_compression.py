@@ -0,0 +1,93 @@
+"""
+Benchmarks chunk relevance scoring: langchain's EmbeddingsFilter against the NumPy path of the session index
+(`Memory.search` per query, and `Memory.search_many` for all queries at once, without faiss).
+
+Embeddings are deterministic random vectors served from memory, so only the scoring and
+selection work is measured, not the embedding provider.
+
+    python -m backend.benchmarks.bench_compression --sizes 1000 10000 100000 --dim 384
+"""
+import argparse
+import time
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.retrievers.document_compressors import EmbeddingsFilter
+from langchain.schema import Document
+
+from backend.context.similarity import normalize_rows, score, score_many, top_k_above_threshold
+
+THRESHOLD = 0.20
+MAX_RESULTS = 8
+
+
+class LookupEmbeddings(Embeddings):
+    """Returns precomputed vectors, so both paths pay the same (near zero) embedding cost."""
+    def __init__(self, vectors, queries):
+        self.vectors = vectors
+        self.queries = queries
+
+    def embed_documents(self, texts):
+        return [self.queries[text] if text in self.queries else self.vectors[int(text)] for text in texts]
+
+    def embed_query(self, text):
+        return self.queries[text]
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(size, dim, num_queries, repeat, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((size, dim), dtype=np.float32)
+    queries = {f"q{i}": vectors[rng.integers(size)] + rng.standard_normal(dim, dtype=np.float32) for i in range(num_queries)}
+    embeddings = LookupEmbeddings(vectors, queries)
+    docs = [Document(page_content=str(i), metadata={"source": f"https://example.com/{i}"}) for i in range(size)]
+    texts = [doc.page_content for doc in docs]
+
+    relevance_filter = EmbeddingsFilter(embeddings=embeddings, similarity_threshold=THRESHOLD)
+
+    def legacy():
+        for query in queries:
+            relevance_filter.compress_documents(docs, query)[:MAX_RESULTS]
+
+    def native():
+        matrix = normalize_rows(embeddings.embed_documents(texts))
+        for query in queries:
+            scores = score(matrix, normalize_rows(embeddings.embed_query(query)))
+            top_k_above_threshold(scores, MAX_RESULTS, THRESHOLD)
+
+    def native_batched():
+        matrix = normalize_rows(embeddings.embed_documents(texts))
+        query_matrix = normalize_rows(embeddings.embed_documents(list(queries)))
+        for scores in score_many(matrix, query_matrix):
+            top_k_above_threshold(scores, MAX_RESULTS, THRESHOLD)
+
+    results = {name: timed(func, repeat) for name, func in
+               (("langchain", legacy), ("native", native), ("native_batched", native_batched))}
+    print(
+        f"{size:>8} chunks x {num_queries} queries | "
+        + " | ".join(f"{name}: {seconds * 1000:9.2f} ms" for name, seconds in results.items())
+        + f" | speedup: {results['langchain'] / results['native_batched']:.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.dim, args.queries, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmarks HTML text extraction on a corpus of saved pages: the previous BeautifulSoup path
+(find_all plus repeated string concatenation), the current bs and lxml engines, and newspaper3k
+when it is installed.
+
+Pages are read from disk, so only parsing and extraction are measured, not the network.
+--scale repeats each page's body to simulate very large pages.
+
+    python -m backend.benchmarks.bench_extraction --fixtures backend/benchmarks/fixtures/html --scale 1 10
+"""
+import argparse
+import pathlib
+import re
+import time
+import tracemalloc
+
+from backend.scraper.extraction import extract_with_bs, extract_with_lxml, extract_with_newspaper
+
+FIXTURES = pathlib.Path(__file__).parent / "fixtures" / "html"
+
+
+def legacy_bs(html, encoding=None, max_bytes=None):
+    """The extraction the scraper used before the pluggable engines, kept verbatim for comparison."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'lxml', from_encoding=encoding)
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.extract()
+    text = ""
+    for element in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5']):
+        text += element.text + "\n"
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)
+
+
+def engines():
+    found = {"legacy_bs": legacy_bs, "bs": extract_with_bs, "lxml": extract_with_lxml}
+    try:
+        import newspaper as _  # noqa: F401
+        found["newspaper"] = extract_with_newspaper
+    except ImportError:
+        print("newspaper3k is not installed, skipping it")
+    return found
+
+
+def scale_page(html: bytes, factor: int) -> bytes:
+    """Repeats the body's content `factor` times."""
+    if factor <= 1:
+        return html
+    match = re.search(rb"<body[^>]*>(.*)</body>", html, re.S)
+    if not match:
+        return html * factor
+    return html[:match.start(1)] + match.group(1) * factor + html[match.end(1):]
+
+
+def timed(func, html, repeat):
+    best = float("inf")
+    output = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func(html, "utf-8")
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def peak_memory(func, html):
+    tracemalloc.start()
+    try:
+        func(html, "utf-8")
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=pathlib.Path, default=FIXTURES)
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = sorted(args.fixtures.glob("*.html"))
+    if not pages:
+        raise SystemExit(f"No .html fixtures in {args.fixtures}")
+    available = engines()
+    for factor in args.scale:
+        for page in pages:
+            html = scale_page(page.read_bytes(), factor)
+            print(f"{page.name} x{factor} ({len(html) / 1024:.0f} KiB)")
+            for name, func in available.items():
+                seconds, output = timed(func, html, args.repeat)
+                peak = peak_memory(func, html)
+                print(
+                    f"  {name:>10}: {seconds * 1000:9.2f} ms | peak {peak / 1024 / 1024:7.2f} MiB | "
+                    f"{len(output):>8} chars, {output.count(chr(10)) + 1:>6} lines"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmarks search throughput against the local fake SearxNG server: the previous pattern (a new
+client and a blocking request per query, in worker threads) against SearxClient.search_many,
+cold and with a warm result cache.
+
+Queries are drawn with repeats, like sub-queries and their gap-filling variants are in practice.
+
+    python -m backend.benchmarks.bench_search --queries 200 --distinct 60 --latency 0.1 --concurrency 4
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from backend.benchmarks.fake_searx import FakeSearxServer
+from backend.retriever.searx.searx import SearxClient
+
+
+def legacy_search(host, query):
+    with httpx.Client(timeout=10) as client:
+        response = client.get(f"{host}/search", params={"q": query, "format": "json"})
+        return response.json()["results"]
+
+
+async def run_legacy(host, queries, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        async with semaphore:
+            return await asyncio.to_thread(legacy_search, host, query)
+
+    return await asyncio.gather(*(one(query) for query in queries))
+
+
+async def run(num_queries, distinct, latency, concurrency, seed=0):
+    rng = random.Random(seed)
+    topics = [f"electric vehicle battery supplier {i}" for i in range(distinct)]
+    # Same query with different casing and spacing, as the LLM tends to produce
+    queries = [rng.choice([t, t.upper(), f"  {t} "]) for t in (rng.choice(topics) for _ in range(num_queries))]
+
+    async with FakeSearxServer(latency=latency) as server:
+        timings = {}
+
+        start = time.perf_counter()
+        await run_legacy(server.url, queries, concurrency)
+        timings["legacy"] = (time.perf_counter() - start, server.requests)
+
+        client = SearxClient(server.url, concurrency=concurrency)
+        for name in ("search_many (cold)", "search_many (warm)"):
+            before = server.requests
+            start = time.perf_counter()
+            await client.search_many(queries)
+            timings[name] = (time.perf_counter() - start, server.requests - before)
+        await client.aclose()
+
+    print(f"{num_queries} queries ({distinct} distinct), {latency * 1000:.0f} ms server latency, concurrency {concurrency}")
+    for name, (seconds, requests) in timings.items():
+        print(f"  {name:>20}: {seconds:7.2f} s | {num_queries / seconds:8.1f} queries/s | {requests:>4} server requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.queries, args.distinct, args.latency, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+A local stand-in for a SearxNG instance, for benchmarking and offline development.
+
+It answers GET /search?q=...&format=json with deterministic results after a fixed latency,
+over HTTP/1.1 keep-alive connections, and counts the requests it served.
+
+    python -m backend.benchmarks.fake_searx --port 8888 --latency 0.3
+    SEARX_URL=http://127.0.0.1:8888 uvicorn backend.server:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+from urllib.parse import parse_qs, urlsplit
+
+DOMAINS = ("example.com", "wikipedia.org", "news.example.net", "docs.example.org", "shop.example.io")
+
+
+def fake_results(query, count):
+    words = query.split() or ["result"]
+    slug = "-".join(words)[:60]
+    results = []
+    for i in range(count):
+        digest = hashlib.sha1(f"{query}:{i}".encode("utf-8")).hexdigest()
+        domain = DOMAINS[int(digest[:2], 16) % len(DOMAINS)]
+        results.append({
+            "url": f"https://{domain}/{slug}/{digest[:8]}",
+            "title": f"{' '.join(words).title()} ({i + 1})",
+            "content": f"{query} - snippet {i + 1} with {' '.join(words[::-1])} and the figure {int(digest[2:6], 16)}.",
+            "engine": "fake",
+        })
+    return results
+
+
+class FakeSearxServer:
+    """
+    Minimal SearxNG JSON API: GET /search with 'q' (and optionally 'engines'), anything else is a 404
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, results_per_query=10):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.results_per_query = results_per_query
+        self.requests = 0
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                status, body = await self._respond(method, target)
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n".encode("latin-1") + body
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target):
+        url = urlsplit(target)
+        if method != "GET" or url.path != "/search":
+            return "404 Not Found", b'{"error": "not found"}'
+        self.requests += 1
+        query = parse_qs(url.query).get("q", [""])[0]
+        await asyncio.sleep(self.latency)
+        body = {"query": query, "results": fake_results(query, self.results_per_query)}
+        return "200 OK", json.dumps(body).encode("utf-8")
+
+
+async def serve(host, port, latency, results):
+    server = FakeSearxServer(host, port, latency, results)
+    print(f"Fake SearxNG listening on {await server.start()}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--results", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.latency, args.results))
+
+
+if __name__ == "__main__":
+    main()
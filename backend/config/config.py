@@ -10,7 +10,13 @@ class Config:
         """Initialize the config class."""
         self.config_file = config_file if config_file else os.getenv("CONFIG_FILE")
         self.retriever = os.getenv("SEARCH_RETRIEVER", "searx")
+        self.searx_engines = [e.strip() for e in os.getenv("SEARX_ENGINES", "").split(",") if e.strip()]
+        self.searx_concurrency = int(os.getenv("SEARX_CONCURRENCY", 4))
+        self.searx_cache_ttl = int(os.getenv("SEARX_CACHE_TTL", 3600))
+        self.searx_timeout = float(os.getenv("SEARX_TIMEOUT", 10))
         self.embedding_provider = os.getenv("EMBEDDING_PROVIDER", "openai")
+        self.embedding_cache = os.getenv("EMBEDDING_CACHE", "true").lower() == "true"
+        self.embedding_cache_path = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite")
         self.llm_provider = os.getenv("LLM_PROVIDER", "openai")
         self.fast_llm_model = os.getenv(
             "FAST_LLM_MODEL", "gpt-4o"
@@ -23,6 +29,18 @@ class Config:
         self.browse_chunk_max_length = int(os.getenv("BROWSE_CHUNK_MAX_LENGTH", 8192))
         self.summary_token_limit = int(os.getenv("SUMMARY_TOKEN_LIMIT", 700))
         self.temperature = float(os.getenv("TEMPERATURE", 0.1))
+        self.llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", 50))
+        self.llm_max_keepalive = int(os.getenv("LLM_MAX_KEEPALIVE", 20))
+        self.llm_requests_per_minute = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 500))
+        self.llm_tokens_per_minute = int(os.getenv("LLM_TOKENS_PER_MINUTE", 200000))
+        # Per provider/model overrides, e.g. {"openai/gpt-4o": {"rpm": 500, "tpm": 30000}}
+        self.llm_rate_limits = json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))
+        self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", 5))
+        self.llm_cache = os.getenv("LLM_CACHE", "true").lower() == "true"
+        self.llm_cache_path = os.getenv("LLM_CACHE_PATH", "cache/llm.sqlite")
+        self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+        self.llm_cache_semantic = os.getenv("LLM_CACHE_SEMANTIC", "false").lower() == "true"
+        self.llm_cache_semantic_threshold = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", 0.97))
         self.user_agent = os.getenv(
             "USER_AGENT",
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -32,9 +50,65 @@ class Config:
             os.getenv("MAX_SEARCH_RESULTS_PER_QUERY", 7)
         )
         self.memory_backend = os.getenv("MEMORY_BACKEND", "local")
+        self.memory_index = os.getenv("MEMORY_INDEX", "flat")  # flat | hnsw
+        self.memory_min_score = float(os.getenv("MEMORY_MIN_SCORE", 0.35))
+        self.memory_min_hits = int(os.getenv("MEMORY_MIN_HITS", 4))
         self.max_iterations = int(os.getenv("MAX_ITERATIONS", 2))
+        self.scrape_budget = int(os.getenv("SCRAPE_BUDGET", 12))
+        self.context_mode = os.getenv("CONTEXT_MODE", "full")  # full | snippet_first
+        self.snippet_min_fill = float(os.getenv("SNIPPET_MIN_FILL", 0.8))
+        # Columns identifying a row for deduplication, defaults to the first column
+        self.row_key_columns = [c.strip() for c in os.getenv("ROW_KEY_COLUMNS", "").split(",") if c.strip()]
+        self.row_near_duplicate_threshold = float(os.getenv("ROW_NEAR_DUPLICATE_THRESHOLD", 0.8))
+        self.row_stall_budget = int(os.getenv("ROW_STALL_BUDGET", 3))
+        self.row_prompt_token_budget = int(os.getenv("ROW_PROMPT_TOKEN_BUDGET", 12000))
+        self.row_prompt_max_chunks = int(os.getenv("ROW_PROMPT_MAX_CHUNKS", 64))
+        self.gap_fill_grouping = os.getenv("GAP_FILL_GROUPING", "row")  # row | column
+        self.gap_fill_concurrency = int(os.getenv("GAP_FILL_CONCURRENCY", 4))
         self.agent_role = os.getenv("AGENT_ROLE", None)
+        self.job_backend = os.getenv("JOB_BACKEND", "local")  # local | sqlite
+        self.job_db_path = os.getenv("JOB_DB_PATH", "cache/jobs.sqlite")
+        self.job_workers = int(os.getenv("JOB_WORKERS", 2))
+        self.job_concurrency = int(os.getenv("JOB_CONCURRENCY", 2))
+        self.job_max_pending = int(os.getenv("JOB_MAX_PENDING", 20))
+        self.jobs_per_client = int(os.getenv("JOBS_PER_CLIENT", 2))  # unfinished jobs per client address
+        self.job_retention = int(os.getenv("JOB_RETENTION", 3600))  # seconds finished jobs and their events are kept
+        self.session_checkpoints = os.getenv("SESSION_CHECKPOINTS", "true").lower() == "true"
+        self.session_db_path = os.getenv("SESSION_DB_PATH", "cache/sessions.sqlite")
+        self.ws_queue_size = int(os.getenv("WS_QUEUE_SIZE", 1000))
+        self.ws_flush_interval = float(os.getenv("WS_FLUSH_INTERVAL", 0.05))
+        self.ws_log_policy = os.getenv("WS_LOG_POLICY", "merge")  # merge | drop
         self.scraper = os.getenv("SCRAPER", "bs")
+        self.scraper_max_in_flight = int(os.getenv("SCRAPER_MAX_IN_FLIGHT", 20))
+        self.scraper_per_host_limit = int(os.getenv("SCRAPER_PER_HOST_LIMIT", 4))
+        self.scraper_max_connections = int(os.getenv("SCRAPER_MAX_CONNECTIONS", 100))
+        self.scraper_max_keepalive = int(os.getenv("SCRAPER_MAX_KEEPALIVE", 20))
+        self.scraper_http2 = os.getenv("SCRAPER_HTTP2", "true").lower() == "true"
+        self.html_extractor = os.getenv("HTML_EXTRACTOR", "lxml")  # lxml | bs | newspaper
+        self.html_max_bytes = int(os.getenv("HTML_MAX_BYTES", 2 * 1024 * 1024))
+        self.pdf_max_bytes = int(os.getenv("PDF_MAX_BYTES", 50 * 1024 * 1024))
+        self.pdf_max_pages = int(os.getenv("PDF_MAX_PAGES", 60))
+        self.pdf_max_chars = int(os.getenv("PDF_MAX_CHARS", 200000))
+        self.pdf_pages_per_task = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+        self.pdf_workers = int(os.getenv("PDF_WORKERS", 2))  # page batches of one PDF in flight
+        self.cpu_workers = int(os.getenv("CPU_WORKERS", 0)) or None  # defaults to the number of cores
+        self.cpu_shared_min_bytes = int(os.getenv("CPU_SHARED_MIN_BYTES", 256 * 1024))
+        self.loop_lag_interval = float(os.getenv("LOOP_LAG_INTERVAL", 0.1))
+        self.loop_block_threshold_ms = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 250))  # 0 disables the watchdog
+        self.tracing = os.getenv("TRACING", "true").lower() == "true"
+        self.trace_export_path = os.getenv("TRACE_EXPORT_PATH", "")  # e.g. cache/traces.otlp.jsonl, empty disables the export
+        self.trace_export_max_bytes = int(os.getenv("TRACE_EXPORT_MAX_BYTES", 64 * 1024 * 1024))  # rotated to <path>.1 past this
+        self.scraper_default_timeout = float(os.getenv("SCRAPER_DEFAULT_TIMEOUT", 6))
+        self.scraper_min_timeout = float(os.getenv("SCRAPER_MIN_TIMEOUT", 2))
+        self.scraper_max_timeout = float(os.getenv("SCRAPER_MAX_TIMEOUT", 15))
+        self.scraper_breaker_failures = int(os.getenv("SCRAPER_BREAKER_FAILURES", 3))
+        self.scraper_breaker_cooldown = float(os.getenv("SCRAPER_BREAKER_COOLDOWN", 600))
+        self.page_cache = os.getenv("PAGE_CACHE", "true").lower() == "true"
+        self.page_cache_path = os.getenv("PAGE_CACHE_PATH", "cache/pages.sqlite")
+        self.page_cache_max_bytes = int(os.getenv("PAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+        self.page_cache_ttl_document = int(os.getenv("PAGE_CACHE_TTL_DOCUMENT", 30 * 86400))
+        self.page_cache_ttl_news = int(os.getenv("PAGE_CACHE_TTL_NEWS", 3600))
+        self.page_cache_ttl_default = int(os.getenv("PAGE_CACHE_TTL_DEFAULT", 86400))
 
         self.load_config_file()
 
@@ -1,4 +1,4 @@
-from .compression import ContextCompressor
+from .compression import pretty_print_chunks, split_pages
 from .retriever import SearchAPIRetriever
 
-__all__ = ['ContextCompressor', 'SearchAPIRetriever']
+__all__ = ['SearchAPIRetriever', 'pretty_print_chunks', 'split_pages']
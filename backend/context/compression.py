@@ -1,44 +1,101 @@
-from .retriever import SearchAPIRetriever
-from langchain.retrievers import (
-    ContextualCompressionRetriever,
-)
-from langchain.retrievers.document_compressors import (
-    DocumentCompressorPipeline,
-    EmbeddingsFilter,
-)
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from backend.utils.pages import PAGE_SEPARATOR
+from backend.utils.cpu_pool import get_cpu_pool
+from backend.utils.tracing import get_tracer
+
+
+# The splitter is stateless, build it once rather than on every compression
+_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+
+
+def split_page(page):
+    """
+    Splits a scraped page into chunk dicts. PDF text is split page by page, and its chunks carry their page number.
+    """
+    raw_content = page.get("raw_content") or ""
+    base = {"source": page.get("url", ""), "title": page.get("title", "")}
+    if PAGE_SEPARATOR not in raw_content:
+        return [dict(base, content=text) for text in _splitter.split_text(raw_content)]
+    return [
+        dict(base, content=text, page=number)
+        for number, page_text in enumerate(raw_content.split(PAGE_SEPARATOR), start=1)
+        for text in _splitter.split_text(page_text)
+    ]
+
+
+# Pages are packed into one string for the CPU pool, one record per page
+_RECORD_SEPARATOR = "\x1e"
+
+
+def _spans(text, offset):
+    """
+    Chunks of `text` as (start, end) offsets shifted by `offset`, or as the chunk text in the rare case the
+    splitter did not keep it verbatim.
+    """
+    cursor = 0
+    for chunk in _splitter.split_text(text):
+        start = text.find(chunk, cursor)
+        if start < 0:
+            yield chunk
+        else:
+            yield offset + start, offset + start + len(chunk)
+            # Chunks overlap, the next one may start before this one ends
+            cursor = start + 1
+
+
+def split_packed(packed):
+    """
+    Runs in a pool process: splits pages packed by `split_pages`. The chunks go back as offsets into the
+    packed text, which the caller already holds, so the text is not pickled back.
+    Returns:
+        list: (page index, PDF page number or None, (start, end) or chunk text) per chunk, in page order
+    """
+    spans = []
+    position = 0
+    for index, raw_content in enumerate(packed.split(_RECORD_SEPARATOR)):
+        if PAGE_SEPARATOR not in raw_content:
+            spans.extend((index, None, span) for span in _spans(raw_content, position))
+        else:
+            page_position = position
+            for number, page_text in enumerate(raw_content.split(PAGE_SEPARATOR), start=1):
+                spans.extend((index, number, span) for span in _spans(page_text, page_position))
+                page_position += len(page_text) + len(PAGE_SEPARATOR)
+        position += len(raw_content) + len(_RECORD_SEPARATOR)
+    return spans
+
+
+def split_pages(pages, pool_min_chars=100_000):
+    """
+    Splits several pages into chunks, in page order. Above `pool_min_chars` of text the work goes to the CPU pool,
+    with all the page texts in a single shared buffer, and the chunks come back as offsets into it.
+    """
+    chars = sum(len(page.get("raw_content") or "") for page in pages)
+    with get_tracer().span("split", pages=len(pages), chars=chars) as span:
+        if chars < pool_min_chars:
+            chunks = [chunk for page in pages for chunk in split_page(page)]
+        else:
+            packed = _RECORD_SEPARATOR.join((page.get("raw_content") or "").replace(_RECORD_SEPARATOR, " ") for page in pages)
+            bases = [{"source": page.get("url", ""), "title": page.get("title", "")} for page in pages]
+            chunks = [
+                dict(
+                    bases[index],
+                    content=packed[span[0]:span[1]] if isinstance(span, tuple) else span,
+                    **({"page": number} if number is not None else {}),
+                )
+                for index, number, span in get_cpu_pool().call(split_packed, packed)
+            ]
+        span.set(chunks=len(chunks))
+    return chunks
+
+
+def _source(chunk):
+    return f"{chunk.get('source')} (page {chunk['page']})" if "page" in chunk else chunk.get("source")
+
+
+def pretty_print_chunks(chunks):
+    return f"\n".join(f"Source: {_source(c)}\n"
+                      f"Title: {c.get('title')}\n"
+                      f"Content: {c.get('content')}\n"
+                      for c in chunks)
 
-class ContextCompressor:
-    def __init__(self, documents, embeddings, max_results=5, **kwargs):
-        self.max_results = max_results
-        self.documents = documents
-        self.kwargs = kwargs
-        self.embeddings = embeddings
-        self.similarity_threshold = 0.20
-
-    def _get_contextual_retriever(self):
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        relevance_filter = EmbeddingsFilter(embeddings=self.embeddings,
-                                             similarity_threshold=self.similarity_threshold)
-        pipeline_compressor = DocumentCompressorPipeline(
-            transformers=[splitter, relevance_filter]
-        )
-        base_retriever = SearchAPIRetriever(
-            pages=self.documents
-        )
-        contextual_retriever = ContextualCompressionRetriever(
-            base_compressor=pipeline_compressor, base_retriever=base_retriever
-        )
-        return contextual_retriever
-
-    def _pretty_print_docs(self, docs, top_n):
-        return f"\n".join(f"Source: {d.metadata.get('source')}\n"
-                          f"Title: {d.metadata.get('title')}\n"
-                          f"Content: {d.page_content}\n"
-                          for i, d in enumerate(docs) if i < top_n)
-
-    def get_context(self, query, max_results=5):
-        compressed_docs = self._get_contextual_retriever()
-        relevant_docs = compressed_docs.get_relevant_documents(query)
-        return self._pretty_print_docs(relevant_docs, max_results)
\ No newline at end of file
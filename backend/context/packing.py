@@ -0,0 +1,74 @@
+import re
+from typing import Dict, List
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - fall back to a character estimate
+    tiktoken = None
+
+_words = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tokenizer when tiktoken knows it, ~4 characters per token otherwise.
+    """
+    def __init__(self, model=None):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except (KeyError, TypeError):
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count(self, text) -> int:
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+class ContextPacker:
+    """
+    Packs ranked context chunks into a prompt token budget.
+    Chunks that repeat or mostly overlap a chunk already packed are dropped, so overlapping
+    results from different sub-queries (and splitter overlap) are not paid for twice.
+    """
+    def __init__(self, model=None, budget=12000, overlap_threshold=0.8, ngram=8):
+        self.counter = TokenCounter(model)
+        self.budget = budget
+        self.overlap_threshold = overlap_threshold
+        self.ngram = ngram
+
+    def count(self, text) -> int:
+        return self.counter.count(text)
+
+    def _ngrams(self, text):
+        words = _words.findall(text.lower())
+        if len(words) <= self.ngram:
+            return {tuple(words)}
+        return {tuple(words[i:i + self.ngram]) for i in range(len(words) - self.ngram + 1)}
+
+    def pack(self, chunks: List[Dict], reserved_tokens=0) -> List[Dict]:
+        """
+        Args:
+            chunks: chunk dicts with 'content' (and 'source'/'title'), most relevant first
+            reserved_tokens: tokens already used by the rest of the prompt
+
+        Returns:
+            list: the chunks that fit, in rank order
+        """
+        remaining = self.budget - reserved_tokens
+        packed = []
+        seen_ngrams = set()
+        for chunk in chunks:
+            ngrams = self._ngrams(chunk["content"])
+            if not ngrams or len(ngrams & seen_ngrams) / len(ngrams) >= self.overlap_threshold:
+                continue
+            # Account for the Source/Title/Content framing the chunk is printed with
+            tokens = self.count(chunk["content"]) + self.count(f"{chunk.get('source')} {chunk.get('title')}") + 6
+            if tokens > remaining:
+                continue
+            packed.append(chunk)
+            seen_ngrams |= ngrams
+            remaining -= tokens
+        return packed
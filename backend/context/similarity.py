@@ -0,0 +1,43 @@
+import numpy as np
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """
+    L2-normalizes vectors into a contiguous float32 array, so cosine similarity becomes a dot product
+    Args:
+        vectors: (n, dim) or (dim,) array-like
+
+    Returns:
+        np.ndarray: float32 array of the same shape
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k_above_threshold(scores, k, threshold):
+    """
+    Selects the best k scores that are above a threshold
+    Args:
+        scores: (n,) similarity scores
+        k: maximum number of indices to return
+        threshold: scores must be strictly greater than this
+
+    Returns:
+        np.ndarray: indices, best first
+    """
+    candidates = np.flatnonzero(scores > threshold)
+    if candidates.size > k:
+        # argpartition is O(n), only the k survivors get fully sorted
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def score(matrix, query_vector) -> np.ndarray:
+    """Cosine similarity of one normalized query against every normalized row, one matrix-vector product."""
+    return matrix @ query_vector
+
+
+def score_many(matrix, query_matrix) -> np.ndarray:
+    """Cosine similarity of several normalized queries at once, one matrix-matrix product. Shape (queries, rows)."""
+    return query_matrix @ matrix.T
@@ -0,0 +1,42 @@
+from .channel import JobChannel, JobEventSink, JobRejected
+from .queue import LocalJobQueue, SQLiteJobQueue
+
+
+def get_job_queue(cfg):
+    """
+    Builds the job queue selected by the config
+    Args:
+        cfg: Config
+
+    Returns:
+        LocalJobQueue or SQLiteJobQueue
+    """
+    match cfg.job_backend:
+        case "local":
+            return LocalJobQueue(
+                concurrency=cfg.job_concurrency,
+                max_pending=cfg.job_max_pending,
+                retention=cfg.job_retention,
+                per_client=cfg.jobs_per_client,
+            )
+        case "sqlite":
+            return SQLiteJobQueue(
+                cfg.job_db_path,
+                workers=cfg.job_workers,
+                concurrency=cfg.job_concurrency,
+                max_pending=cfg.job_max_pending,
+                retention=cfg.job_retention,
+                per_client=cfg.jobs_per_client,
+            )
+        case _:
+            raise Exception("Job backend not found.")
+
+
+__all__ = [
+    "JobChannel",
+    "JobEventSink",
+    "JobRejected",
+    "LocalJobQueue",
+    "SQLiteJobQueue",
+    "get_job_queue",
+]
@@ -0,0 +1,58 @@
+import asyncio
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class JobRejected(Exception):
+    """Raised when admission control refuses a new job."""
+
+
+class JobChannel:
+    """
+    In-memory pub/sub channel for one job's progress events.
+    Every event is kept, so a socket that attaches late (or reconnects) replays the run from the start.
+    """
+    def __init__(self):
+        self.events = []
+        self.subscribers = set()
+        self.closed = False
+
+    def publish(self, event):
+        self.events.append(event)
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    def close(self):
+        self.closed = True
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+    async def subscribe(self, after=0):
+        """Yields events from position `after` onwards until the job finishes."""
+        queue = asyncio.Queue()
+        backlog = self.events[after:]
+        closed = self.closed
+        self.subscribers.add(queue)
+        try:
+            for event in backlog:
+                yield event
+            if closed:
+                return
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self.subscribers.discard(queue)
+
+
+class JobEventSink:
+    """
+    Stands in for a websocket inside a job: whatever the research pipeline sends becomes a job event.
+    """
+    def __init__(self, publish):
+        self.publish = publish
+
+    async def send_json(self, data):
+        await self.publish(data)
@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+import time
+import uuid
+from typing import Dict, Optional
+
+from .channel import TERMINAL_STATUSES, JobChannel, JobRejected
+from .store import JobStore
+from .worker import run_job, worker_main
+
+
+class LocalJobQueue:
+    """
+    In-process job queue: jobs run on this process's event loop, at most `concurrency` at a time,
+    and their events go to in-memory channels.
+    Each client can have at most `per_client` unfinished jobs, finished ones are kept `retention` seconds.
+    """
+    def __init__(self, concurrency=2, max_pending=20, retention=3600, per_client=2):
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.retention = retention
+        self.per_client = per_client
+        self.jobs: Dict[str, Dict] = {}
+        self.channels: Dict[str, JobChannel] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, params, client=None) -> str:
+        """
+        Queues a job
+        Args:
+            params: job parameters, see run_job
+            client: identity of the submitter (e.g. its address), whose unfinished jobs are capped
+        """
+        if self.queue.qsize() >= self.max_pending:
+            raise JobRejected(f"Too many queued jobs ({self.max_pending}), try again later.")
+        if client is not None and sum(
+            job["params"].get("client") == client and job["status"] not in TERMINAL_STATUSES for job in self.jobs.values()
+        ) >= self.per_client:
+            raise JobRejected(f"Too many running jobs for this client ({self.per_client}).")
+        self._expire()
+        if client is not None:
+            params = dict(params, client=client)
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = {"id": job_id, "status": "pending", "params": params, "created_at": time.time()}
+        self.channels[job_id] = JobChannel()
+        self.channels[job_id].publish({"type": "job_status", "id": job_id, "status": "pending"})
+        await self.queue.put(job_id)
+        return job_id
+
+    async def get(self, job_id) -> Optional[Dict]:
+        return self.jobs.get(job_id)
+
+    async def subscribe(self, job_id, after=0):
+        channel = self.channels.get(job_id)
+        if channel is None:
+            return
+        async for event in channel.subscribe(after):
+            yield event
+
+    def _expire(self):
+        """Forgets finished jobs older than the retention window."""
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self.jobs.items()):
+            if job["status"] in TERMINAL_STATUSES and job.get("finished_at", 0) < cutoff:
+                del self.jobs[job_id]
+                del self.channels[job_id]
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs[job_id]
+            channel = self.channels[job_id]
+
+            async def publish(event):
+                channel.publish(event)
+
+            job["status"] = "running"
+            try:
+                await run_job(job_id, job["params"], publish)
+                job["status"] = "done"
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                job["finished_at"] = time.time()
+                channel.close()
+
+
+class SQLiteJobQueue:
+    """
+    Job queue shared through SQLite: this process only enqueues and tails events, jobs run in a
+    pool of worker processes, each with its own event loop running up to `concurrency` jobs.
+    Each client can have at most `per_client` unfinished jobs, finished ones and their events are
+    deleted after `retention` seconds.
+    """
+    def __init__(self, path, workers=2, concurrency=2, max_pending=20, poll_interval=0.25, retention=3600, per_client=2):
+        self.store = JobStore(path)
+        self.path = path
+        self.num_workers = workers
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.retention = retention
+        self.per_client = per_client
+        self.poll_interval = poll_interval
+        self.processes = []
+
+    async def start(self):
+        # Jobs still marked running without a recent heartbeat were orphaned by workers of a previous server process
+        await asyncio.to_thread(self.store.requeue_stale)
+        context = multiprocessing.get_context("spawn")
+        for _ in range(self.num_workers):
+            process = context.Process(
+                target=worker_main, args=(self.path, self.concurrency, self.poll_interval), daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    async def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            await asyncio.to_thread(process.join, 5)
+        self.processes = []
+
+    async def submit(self, params, client=None) -> str:
+        """
+        Queues a job
+        Args:
+            params: job parameters, see run_job
+            client: identity of the submitter (e.g. its address), whose unfinished jobs are capped
+        """
+        if await asyncio.to_thread(self.store.count, "pending") >= self.max_pending:
+            raise JobRejected(f"Too many queued jobs ({self.max_pending}), try again later.")
+        await asyncio.to_thread(self.store.prune, time.time() - self.retention)
+        # Workers that died since the start lose their jobs to the live ones
+        await asyncio.to_thread(self.store.requeue_stale)
+        if client is not None:
+            params = dict(params, client=client)
+        job_id = uuid.uuid4().hex
+        if not await asyncio.to_thread(self.store.insert_job, job_id, params, client, self.per_client):
+            raise JobRejected(f"Too many running jobs for this client ({self.per_client}).")
+        await asyncio.to_thread(self.store.add_event, job_id, {"type": "job_status", "id": job_id, "status": "pending"})
+        return job_id
+
+    async def get(self, job_id) -> Optional[Dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def subscribe(self, job_id, after=0):
+        """Tails the job's event log. `after` counts events already seen by the caller."""
+        skip = after
+        last_id = 0
+        while True:
+            events = await asyncio.to_thread(self.store.events_after, job_id, last_id)
+            for last_id, event in events:
+                if skip:
+                    skip -= 1
+                    continue
+                yield event
+                if event.get("type") == "job_status" and event.get("status") in TERMINAL_STATUSES:
+                    return
+            if not events:
+                job = await self.get(job_id)
+                if job is None or (job["status"] in TERMINAL_STATUSES and not await asyncio.to_thread(self.store.events_after, job_id, last_id)):
+                    return
+                await asyncio.sleep(self.poll_interval)
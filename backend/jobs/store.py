@@ -0,0 +1,149 @@
+import json
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+from backend.utils.sqlite import SQLiteStore
+
+# Seconds between the heartbeats a worker writes for its running jobs, and after which a silent job counts as orphaned
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 30
+
+
+class JobStore(SQLiteStore):
+    """
+    SQLite tables backing the multi-process job queue: jobs, and an append-only log of their events.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        "id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, worker TEXT, "
+        "error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, heartbeat_at REAL)",
+        "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)",
+        "CREATE TABLE IF NOT EXISTS job_events ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, payload TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, id)",
+    )
+
+    def __init__(self, path):
+        super().__init__(path)
+        with closing(self._connect()) as conn, conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "heartbeat_at" not in columns:
+                try:
+                    # Databases created before heartbeats
+                    conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+                except sqlite3.OperationalError:
+                    # Added by another process in the meantime
+                    pass
+
+    def insert_job(self, job_id, params, client=None, per_client=None) -> bool:
+        """
+        Adds a pending job, unless `client` already has `per_client` unfinished jobs
+        Returns:
+            bool: whether the job was added
+        """
+        with closing(self._connect(autocommit=True)) as conn:
+            # The count and the insert share one write transaction, so concurrent submits cannot both pass the cap
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = client is None or per_client is None or conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running') AND json_extract(params, '$.client') = ?",
+                    (client,),
+                ).fetchone()[0] < per_client
+                if added:
+                    conn.execute(
+                        "INSERT INTO jobs (id, status, params, created_at) VALUES (?, 'pending', ?, ?)",
+                        (job_id, json.dumps(params), time.time()),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def count(self, status) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def claim(self, worker) -> Optional[Tuple[str, Dict]]:
+        """Atomically moves the oldest pending job to running for this worker."""
+        with closing(self._connect(autocommit=True)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, params FROM jobs WHERE status = 'pending' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                        (worker, now, now, row[0]),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return (row[0], json.loads(row[1])) if row else None
+
+    def finish(self, job_id, status, error=None):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def heartbeat(self, worker):
+        """Marks the running jobs of a worker as alive."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE worker = ? AND status = 'running'", (time.time(), worker)
+            )
+
+    def requeue_stale(self, timeout=HEARTBEAT_TIMEOUT) -> int:
+        """
+        Puts jobs orphaned by dead workers back in the queue: running jobs without a heartbeat for `timeout` seconds.
+        Jobs of live workers, including those of other server processes sharing the database, are left alone.
+        """
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'pending', worker = NULL "
+                "WHERE status = 'running' AND COALESCE(heartbeat_at, started_at, 0) < ?",
+                (time.time() - timeout,),
+            ).rowcount
+
+    def prune(self, finished_before) -> int:
+        """Deletes jobs finished before a timestamp, along with their events."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?)",
+                (finished_before,),
+            )
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (finished_before,)
+            ).rowcount
+
+    def get(self, job_id) -> Optional[Dict]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, status, params, error, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "status", "params", "error", "created_at", "started_at", "finished_at")
+        job = dict(zip(keys, row))
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def add_event(self, job_id, event):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT INTO job_events (job_id, payload) VALUES (?, ?)", (job_id, json.dumps(event, default=str)))
+
+    def events_after(self, job_id, after_id=0, limit=500) -> List[Tuple[int, Dict]]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, payload FROM job_events WHERE job_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (job_id, after_id, limit),
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
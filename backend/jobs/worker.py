@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+import traceback
+import uuid
+
+from colorama import Fore, Style
+
+from backend.utils.outbound import OutboundQueue
+
+from .channel import JobEventSink
+from .store import HEARTBEAT_INTERVAL, JobStore
+
+
+async def run_job(job_id, params, publish):
+    """
+    Runs one research job, publishing everything it would have sent to a websocket
+    Args:
+        job_id: job id
+        params: dict with 'task', 'columns', 'rows' and optionally the 'session_id' to resume (defaults to the job id)
+            and the 'context_mode' of the run
+        publish: coroutine function receiving each event
+    """
+    from backend.config import Config
+    from backend.master.checkpoint import get_session_store
+    from backend.utils.websocket_manager import iter_curate
+
+    cfg = Config()
+    session_id = params.get("session_id") or job_id
+    session_store = get_session_store(cfg)
+    if session_store is not None:
+        # Sessions nobody resumed within the job retention window are dropped
+        await asyncio.to_thread(session_store.prune, time.time() - cfg.job_retention)
+    await publish({"type": "job_status", "id": job_id, "status": "running"})
+    try:
+        dataset = await iter_curate(
+            params["task"], params["columns"], params["rows"], JobEventSink(publish),
+            session_id=session_id,
+            context_mode=params.get("context_mode"),
+        )
+        if session_store is not None:
+            # A finished session has nothing left to resume
+            await asyncio.to_thread(session_store.delete, session_id)
+        await publish({"type": "dataset", "output": dataset})
+        await publish({"type": "job_status", "id": job_id, "status": "done"})
+    except Exception as e:
+        print(f"{Fore.RED}Job {job_id} failed: {e}{Style.RESET_ALL}")
+        traceback.print_exc()
+        await publish({"type": "job_status", "id": job_id, "status": "failed", "error": str(e)})
+        raise
+
+
+async def worker_loop(path, concurrency=2, poll_interval=0.25):
+    """
+    Claims jobs from the SQLite queue and runs up to `concurrency` of them at once on this process's event loop.
+    """
+    from backend.config import Config
+    from backend.utils.loop_monitor import get_loop_monitor
+
+    store = JobStore(path)
+    # Blocking callbacks in a worker are reported from the worker's own watchdog
+    get_loop_monitor(Config()).start()
+    worker = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await asyncio.to_thread(store.heartbeat, worker)
+            except Exception as e:
+                print(f"{Fore.RED}Worker {worker} heartbeat failed: {e}{Style.RESET_ALL}")
+
+    # Held with the job tasks so it is not garbage collected, the jobs are requeued once it stops
+    running.add(asyncio.create_task(heartbeat()))
+
+    async def execute(job_id, params):
+        async def write(event):
+            await asyncio.to_thread(store.add_event, job_id, event)
+
+        # Log and report fragments are batched into fewer rows instead of one SQLite write each.
+        # A failed write is retried rather than closing the log, so the dataset and final status still land.
+        events = OutboundQueue(write, stop_on_error=False).start()
+        status, error = "done", None
+        try:
+            await run_job(job_id, params, events.put)
+        except Exception as e:
+            status, error = "failed", str(e)
+        finally:
+            await events.close()
+            await asyncio.to_thread(store.finish, job_id, status, error)
+            slots.release()
+
+    while True:
+        await slots.acquire()
+        job = await asyncio.to_thread(store.claim, worker)
+        if job is None:
+            slots.release()
+            await asyncio.sleep(poll_interval)
+            continue
+        task = asyncio.create_task(execute(*job))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+
+def worker_main(path, concurrency=2, poll_interval=0.25):
+    """Entry point of a worker process."""
+    from dotenv import load_dotenv
+    load_dotenv()
+    asyncio.run(worker_loop(path, concurrency, poll_interval))
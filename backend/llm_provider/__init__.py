@@ -1,9 +1,18 @@
 from .openai.openai import OpenAIProvider
 from .ollama.ollama import OllamaProvider
 from .cpp_inference.cpp_inference import CplusplusProvider
+from .registry import ProviderRegistry, get_provider_registry, close_provider_registry
+from .scheduler import LLMScheduler, Priority, estimate_tokens, get_llm_scheduler
 
 __all__ = [
     "OpenAIProvider",
     "OllamaProvider",
-    "CplusplusProvider"
+    "CplusplusProvider",
+    "ProviderRegistry",
+    "get_provider_registry",
+    "close_provider_registry",
+    "LLMScheduler",
+    "Priority",
+    "estimate_tokens",
+    "get_llm_scheduler",
 ]
\ No newline at end of file
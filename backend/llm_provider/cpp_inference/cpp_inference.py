@@ -1,23 +1,34 @@
 import os
+from contextlib import asynccontextmanager
+
 import httpx
 from colorama import Fore, Style
 
 class CplusplusProvider:
-    def __init__(self, model, temperature, max_tokens):
+    def __init__(self, model, temperature, max_tokens, http_client=None):
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.http_client = http_client
 
-    async def get_chat_response(self, messages, stream, websocket=None):
+    async def get_chat_response(self, messages, stream, websocket=None, on_chunk=None):
         if not stream:
             response = await self.send_request(messages)
-            print(response)
             return response
         else:
-            return await self.stream_response(messages, websocket)
+            return await self.stream_response(messages, websocket, on_chunk)
+
+    @asynccontextmanager
+    async def client(self):
+        """Yields the shared pooled client, or a throwaway one when none was provided."""
+        if self.http_client is not None:
+            yield self.http_client
+        else:
+            async with httpx.AsyncClient() as client:
+                yield client
 
     async def send_request(self, messages):
-        async with httpx.AsyncClient() as client:
+        async with self.client() as client:
             response = await client.post(
                 url="http://inference-server:11434/completion",
                 headers={"Content-Type": "application/json"},
@@ -26,11 +37,11 @@ class CplusplusProvider:
             response.raise_for_status()
             return response.json()
 
-    async def stream_response(self, messages, websocket=None):
+    async def stream_response(self, messages, websocket=None, on_chunk=None):
         paragraph = ""
         response = ""
 
-        async with httpx.AsyncClient() as client:
+        async with self.client() as client:
             async with client.stream(
                 "POST",
                 url="http://inference-server:11434/completion",
@@ -39,6 +50,8 @@ class CplusplusProvider:
             ) as stream_response:
                 async for chunk in stream_response.aiter_text():
                     if chunk:
+                        if on_chunk is not None:
+                            await on_chunk(chunk)
                         response += chunk
                         paragraph += chunk
                         if "\n" in paragraph:
@@ -47,6 +60,5 @@ class CplusplusProvider:
                             else:
                                 print(f"{Fore.GREEN}{paragraph}{Style.RESET_ALL}")
                             paragraph = ""
-                        print(chunk)
 
         return response
\ No newline at end of file
@@ -1,55 +1,77 @@
+import json
 import os
+from contextlib import asynccontextmanager
 
-from litellm import completion
+import httpx
 from colorama import Fore, Style
 
+OLLAMA_CHAT_URL = "http://ollama:11434/api/chat"
+
 
 class OllamaProvider:
+    """
+    Talks to Ollama's chat API directly, so requests share the registry's pooled client
+    (litellm's ollama_chat route opens its own connections and cannot be given one).
+    """
 
     def __init__(
         self,
         model,
         temperature,
-        max_tokens
+        max_tokens,
+        http_client=None
     ):
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.http_client = http_client
 
-    async def get_chat_response(self, messages, stream, webocket=None):
+    async def get_chat_response(self, messages, stream, websocket=None, on_chunk=None):
         if not stream:
-            # Getting output from the model chain using ainvoke for asynchronous invoking
-            response = completion(
-                model=f"ollama_chat/{self.model}", 
-                messages=[{"content": f"{messages}", "role": "user"}], 
-                api_base="http://ollama:11434"
-            )
-            print(response)
-
-            return response
+            return await self.send_request(messages)
+        else:
+            return await self.stream_response(messages, websocket, on_chunk)
+
+    @asynccontextmanager
+    async def client(self):
+        """Yields the shared pooled client, or a throwaway one when none was provided."""
+        if self.http_client is not None:
+            yield self.http_client
         else:
-            return await self.stream_response(messages, websocket)
+            async with httpx.AsyncClient() as client:
+                yield client
 
-    async def stream_response(self, messages, websocket=None):
+    def payload(self, messages, stream):
+        return {"model": self.model, "messages": [{"content": f"{messages}", "role": "user"}], "stream": stream}
+
+    async def send_request(self, messages):
+        async with self.client() as client:
+            response = await client.post(OLLAMA_CHAT_URL, json=self.payload(messages, False))
+            response.raise_for_status()
+            return response.json()["message"]["content"]
+
+    async def stream_response(self, messages, websocket=None, on_chunk=None):
         paragraph = ""
         response = ""
 
-        response = await litellm.acompletion(
-            model=f"ollama_chat/{self.mode}", 
-            messages=[{f"content": "{messages}" ,"role": "user"}], 
-            api_base="http://ollama:11434", 
-            stream=True
-        )
-        async for chunk in response:
-            if chunk is not None:
-                response += chunk
-                paragraph += chunk
-                if "\n" in paragraph:
-                    if websocket is not None:
-                        await websocket.send_json({"type": "report", "output": paragraph})
-                    else:
-                        print(f"{Fore.GREEN}{paragraph}{Style.RESET_ALL}")
-                    paragraph = ""
-                print(chunk)
-        
+        async with self.client() as client:
+            # The reply comes as one JSON object per line, each holding the next fragment
+            async with client.stream("POST", OLLAMA_CHAT_URL, json=self.payload(messages, True)) as completion_stream:
+                completion_stream.raise_for_status()
+                async for line in completion_stream.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line).get("message", {}).get("content")
+                    if chunk:
+                        if on_chunk is not None:
+                            await on_chunk(chunk)
+                        response += chunk
+                        paragraph += chunk
+                        if "\n" in paragraph:
+                            if websocket is not None:
+                                await websocket.send_json({"type": "report", "output": paragraph})
+                            else:
+                                print(f"{Fore.GREEN}{paragraph}{Style.RESET_ALL}")
+                            paragraph = ""
+
         return response
@@ -10,11 +10,13 @@ class OpenAIProvider:
         self,
         model,
         temperature,
-        max_tokens
+        max_tokens,
+        http_client=None
     ):
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.http_client = http_client
         self.api_key = self.get_api_key()
         self.llm = self.get_llm_model()
 
@@ -37,12 +39,13 @@ class OpenAIProvider:
             model=self.model,
             temperature=self.temperature,
             max_tokens=self.max_tokens,
-            api_key=self.api_key
+            api_key=self.api_key,
+            http_async_client=self.http_client
         )
 
         return llm
 
-    async def get_chat_response(self, messages, stream, websocket=None):
+    async def get_chat_response(self, messages, stream, websocket=None, on_chunk=None):
         if not stream:
             # Getting output from the model chain using ainvoke for asynchronous invoking
             output = await self.llm.ainvoke(messages)
@@ -50,9 +53,9 @@ class OpenAIProvider:
             return output.content
 
         else:
-            return await self.stream_response(messages, websocket)
+            return await self.stream_response(messages, websocket, on_chunk)
 
-    async def stream_response(self, messages, websocket=None):
+    async def stream_response(self, messages, websocket=None, on_chunk=None):
         paragraph = ""
         response = ""
 
@@ -60,6 +63,8 @@ class OpenAIProvider:
         async for chunk in self.llm.astream(messages):
             content = chunk.content
             if content is not None:
+                if on_chunk is not None:
+                    await on_chunk(content)
                 response += content
                 paragraph += content
                 if "\n" in paragraph:
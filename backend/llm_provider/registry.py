@@ -0,0 +1,83 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+
+class ProviderRegistry:
+    """
+    Process-wide cache of LLM provider clients, keyed by (provider, model, temperature, max_tokens).
+    Every provider built here shares one pooled async HTTP client.
+    """
+    def __init__(self, max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0, timeout=600.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self._providers: Dict[Tuple, object] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+
+    def http_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._http_client.is_closed or self._loop is not loop:
+            # Pooled connections are bound to the loop that opened them
+            self._http_client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            self._loop = loop
+            self._providers.clear()
+        return self._http_client
+
+    def get(self, llm_provider, model, temperature, max_tokens):
+        """
+        Gets a cached provider client, building it on first use
+        Args:
+            llm_provider: provider name
+            model: model name
+            temperature: sampling temperature
+            max_tokens: max output tokens
+
+        Returns:
+            provider instance
+        """
+        from backend.utils.llm import get_provider
+
+        http_client = self.http_client()
+        key = (llm_provider, model, temperature, max_tokens)
+        provider = self._providers.get(key)
+        if provider is None:
+            ProviderClass = get_provider(llm_provider)
+            provider = ProviderClass(model, temperature, max_tokens, http_client=http_client)
+            self._providers[key] = provider
+        return provider
+
+    async def aclose(self):
+        self._providers.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+
+_registry: Optional[ProviderRegistry] = None
+
+
+def get_provider_registry() -> ProviderRegistry:
+    global _registry
+    if _registry is None:
+        from backend.config import Config
+
+        cfg = Config()
+        _registry = ProviderRegistry(
+            max_connections=cfg.llm_max_connections,
+            max_keepalive_connections=cfg.llm_max_keepalive,
+        )
+    return _registry
+
+
+async def close_provider_registry():
+    """Closes pooled provider connections, called on FastAPI shutdown."""
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from enum import IntEnum
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BACKGROUND = 2
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute` units per minute, up to a full minute's worth.
+    """
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be consumed, 0 if it can be now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+
+class Lane:
+    """
+    Admission queue for one (provider, model): requests wait in priority order until
+    both the requests/min and tokens/min buckets can cover them.
+    """
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.waiting = []
+        self.condition = asyncio.Condition()
+        self.in_flight = 0
+        self.stats = {"admitted": 0, "completed": 0, "failed": 0, "retries": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    async def admit(self, entry, tokens):
+        started = time.monotonic()
+        async with self.condition:
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    timeout = None
+                    if self.waiting[0] == entry:
+                        timeout = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if timeout <= 0:
+                            self.requests.consume(1)
+                            self.tokens.consume(tokens)
+                            heapq.heappop(self.waiting)
+                            self.condition.notify_all()
+                            break
+                    try:
+                        await asyncio.wait_for(self.condition.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self.waiting:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    self.condition.notify_all()
+                raise
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds"] += time.monotonic() - started
+
+
+def response_status(error) -> Optional[int]:
+    """Best effort HTTP status of a provider error (httpx, openai and litellm errors all carry one)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    status = response_status(error)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+class LLMScheduler:
+    """
+    Central scheduler for every provider call in the process.
+    Applies per (provider, model) token-bucket limits for requests/min and tokens/min, admits
+    waiting calls by priority, and retries 429/5xx/transport errors with exponential backoff and jitter.
+    """
+    def __init__(self, default_rpm=500, default_tpm=200_000, limits=None, max_retries=5, backoff_base=1.0, backoff_max=60.0):
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self.limits = limits or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lanes: Dict[Tuple[str, str], Lane] = {}
+        self._sequence = itertools.count()
+        self._loop = None
+
+    def lane(self, llm_provider, model) -> Lane:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Conditions are bound to the loop that first awaited them
+            self._lanes = {}
+            self._loop = loop
+        key = (llm_provider, model)
+        lane = self._lanes.get(key)
+        if lane is None:
+            limits = self.limits.get(f"{llm_provider}/{model}", {})
+            lane = Lane(limits.get("rpm", self.default_rpm), limits.get("tpm", self.default_tpm))
+            self._lanes[key] = lane
+        return lane
+
+    def backoff(self, attempt, error):
+        hint = retry_after(error)
+        if hint is not None:
+            return min(hint, self.backoff_max)
+        # Full jitter: uniform over [0, base * 2^attempt]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def submit(self, llm_provider, model, call, priority=Priority.DEFAULT, tokens=1, can_retry=None):
+        """
+        Runs `call` once the lane admits it, retrying transient failures
+        Args:
+            llm_provider: provider name
+            model: model name
+            call: zero-argument coroutine function performing the provider request
+            priority: Priority class
+            tokens: estimated prompt + completion tokens
+            can_retry: optional function telling whether a failed call may still be retried
+                (streaming calls can not once they have delivered output)
+
+        Returns:
+            the result of `call`
+        """
+        lane = self.lane(llm_provider, model)
+        for attempt in range(self.max_retries + 1):
+            await lane.admit((int(priority), next(self._sequence)), tokens)
+            lane.in_flight += 1
+            try:
+                result = await call()
+                lane.stats["completed"] += 1
+                return result
+            except Exception as e:
+                if response_status(e) == 429:
+                    lane.stats["rate_limited"] += 1
+                if attempt == self.max_retries or not is_retryable(e) or (can_retry is not None and not can_retry()):
+                    lane.stats["failed"] += 1
+                    logging.error(f"Failed to get response from {llm_provider} API: {e}")
+                    raise
+                delay = self.backoff(attempt, e)
+                lane.stats["retries"] += 1
+                logging.warning(f"{llm_provider}/{model} call failed ({e}), retrying in {delay:.1f}s")
+            finally:
+                lane.in_flight -= 1
+            await asyncio.sleep(delay)
+
+    def metrics(self):
+        return {
+            f"{provider}/{model}": dict(
+                lane.stats,
+                queue_depth=len(lane.waiting),
+                in_flight=lane.in_flight,
+                requests_available=round(lane.requests.level, 2),
+                tokens_available=round(lane.tokens.level, 2),
+            )
+            for (provider, model), lane in self._lanes.items()
+        }
+
+
+def estimate_tokens(messages, max_tokens=None) -> int:
+    """Rough prompt size (4 characters per token) plus the completion budget."""
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return prompt_chars // 4 + (max_tokens or 1000)
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        from backend.config import Config
+
+        cfg = Config()
+        _scheduler = LLMScheduler(
+            default_rpm=cfg.llm_requests_per_minute,
+            default_tpm=cfg.llm_tokens_per_minute,
+            limits=cfg.llm_rate_limits,
+            max_retries=cfg.llm_max_retries,
+        )
+    return _scheduler
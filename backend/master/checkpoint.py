@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+import zlib
+from contextlib import closing
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from backend.master.row_store import EMPTY_VALUE
+from backend.utils.sqlite import SQLiteStore
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # pragma: no cover - pyarrow is optional, tables fall back to compressed json
+    pyarrow = None
+
+# Stage boundaries of a research session, in the order they complete
+STAGES = ("research", "rows", "filled")
+
+
+class SessionStore(SQLiteStore):
+    """
+    Checkpoints of research sessions, keyed by session id, so an interrupted run can resume from its
+    last completed stage. Values are stored as zlib-compressed json blobs, tables as Parquet when
+    pyarrow is installed. The store is SQLite, which makes it safe to share between worker processes.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS sessions ("
+        "id TEXT PRIMARY KEY, stage TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS checkpoints ("
+        "session_id TEXT NOT NULL, name TEXT NOT NULL, format TEXT NOT NULL, payload BLOB NOT NULL, "
+        "updated_at REAL NOT NULL, PRIMARY KEY (session_id, name))",
+    )
+
+    def stage(self, session_id) -> Optional[str]:
+        """Last completed stage of a session, or None for an unknown session."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT stage FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def set_stage(self, session_id, stage):
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO sessions (id, stage, created_at, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET stage = excluded.stage, updated_at = excluded.updated_at",
+                (session_id, stage, now, now),
+            )
+
+    def _put(self, session_id, name, format, payload):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (session_id, name, format, payload, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, name, format, payload, time.time()),
+            )
+
+    def _get(self, session_id, name):
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "SELECT format, payload FROM checkpoints WHERE session_id = ? AND name = ?", (session_id, name)
+            ).fetchone()
+
+    def save(self, session_id, name, value):
+        self._put(session_id, name, "json", zlib.compress(json.dumps(value, default=str).encode("utf-8")))
+
+    def load(self, session_id, name, default=None):
+        row = self._get(session_id, name)
+        if row is None:
+            return default
+        return json.loads(zlib.decompress(row[1]).decode("utf-8"))
+
+    def load_prefix(self, session_id, prefix) -> List:
+        """Every json checkpoint whose name starts with `prefix`, oldest first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT payload FROM checkpoints WHERE session_id = ? AND name LIKE ? AND format = 'json' "
+                "ORDER BY updated_at",
+                (session_id, f"{prefix}%"),
+            ).fetchall()
+        return [json.loads(zlib.decompress(row[0]).decode("utf-8")) for row in rows]
+
+    def save_table(self, session_id, name, df: pd.DataFrame):
+        if pyarrow is not None:
+            try:
+                buffer = io.BytesIO()
+                df.to_parquet(buffer, compression="zstd")
+                self._put(session_id, name, "parquet", buffer.getvalue())
+                return
+            except Exception:
+                # Mixed-type columns can't be written as Parquet, keep them as json
+                pass
+        self._put(session_id, name, "json-split", zlib.compress(df.to_json(orient="split").encode("utf-8")))
+
+    def load_table(self, session_id, name) -> Optional[pd.DataFrame]:
+        row = self._get(session_id, name)
+        if row is None:
+            return None
+        format, payload = row
+        if format == "parquet":
+            return pd.read_parquet(io.BytesIO(payload))
+        return pd.read_json(io.StringIO(zlib.decompress(payload).decode("utf-8")), orient="split", dtype=False, convert_dates=False)
+
+    def snapshot(self, session_id) -> List[Dict]:
+        """
+        The session's current table as row_update messages, so a reconnecting client can redraw it at once
+        """
+        table = self.load_table(session_id, "filled")
+        if table is None:
+            table = self.load_table(session_id, "rows")
+        if table is None:
+            return []
+        table = table.fillna(EMPTY_VALUE)
+        return [{"type": "row_update", "id": int(index), "output": row.to_dict()} for index, row in table.iterrows()]
+
+    def delete(self, session_id):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM checkpoints WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def prune(self, updated_before) -> int:
+        """Deletes the sessions with no checkpoint written since a timestamp."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM checkpoints WHERE session_id IN "
+                "(SELECT session_id FROM checkpoints GROUP BY session_id HAVING MAX(updated_at) < ?)",
+                (updated_before,),
+            )
+            return conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ? AND id NOT IN (SELECT session_id FROM checkpoints)",
+                (updated_before,),
+            ).rowcount
+
+
+class Session:
+    """
+    One session's checkpoints, with every store call run off the event loop.
+    Without a store (checkpointing disabled, or no session id) nothing is saved and nothing is restored.
+    """
+    def __init__(self, store: Optional[SessionStore], session_id=None):
+        self.store = store if session_id else None
+        self.session_id = session_id
+
+    async def _call(self, method, *args, default=None):
+        if self.store is None:
+            return default
+        return await asyncio.to_thread(getattr(self.store, method), self.session_id, *args)
+
+    async def stage(self) -> Optional[str]:
+        return await self._call("stage")
+
+    async def complete(self, stage):
+        await self._call("set_stage", stage)
+
+    async def save(self, name, value):
+        await self._call("save", name, value)
+
+    async def load(self, name, default=None):
+        return await self._call("load", name, default, default=default)
+
+    async def load_prefix(self, prefix) -> List:
+        return await self._call("load_prefix", prefix, default=[])
+
+    async def save_table(self, name, df: pd.DataFrame):
+        await self._call("save_table", name, df)
+
+    async def load_table(self, name) -> Optional[pd.DataFrame]:
+        return await self._call("load_table", name)
+
+
+def page_refs(pages, page_cache) -> List[Dict]:
+    """
+    Scraped pages as checkpointed: with the page cache on, their text stays in the cache and only its hash is saved
+    """
+    if page_cache is None:
+        return pages
+    return [
+        {**{k: v for k, v in page.items() if k != "raw_content"}, "content_hash": page_cache.content_hash(page["raw_content"])}
+        for page in pages
+    ]
+
+
+def resolve_pages(refs, page_cache) -> List[Dict]:
+    """Inverse of page_refs. Pages whose text was evicted from the cache since are left out."""
+    pages = []
+    for ref in refs:
+        if "content_hash" not in ref:
+            pages.append(ref)
+            continue
+        raw_content = page_cache.get_content(ref["content_hash"]) if page_cache is not None else None
+        if raw_content is not None:
+            pages.append({**{k: v for k, v in ref.items() if k != "content_hash"}, "raw_content": raw_content})
+    return pages
+
+
+def checkpoint_key(text) -> str:
+    """Short stable key for checkpoints named after free text, such as a query."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def stage_reached(stage, target) -> bool:
+    """Whether a session at `stage` has completed `target`."""
+    return stage in STAGES and STAGES.index(stage) >= STAGES.index(target)
+
+
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store(cfg=None) -> Optional[SessionStore]:
+    """
+    Gets the process-wide session store, or None when checkpointing is disabled
+    """
+    global _session_store
+    if cfg is not None and not cfg.session_checkpoints:
+        return None
+    if _session_store is None:
+        _session_store = SessionStore(cfg.session_db_path if cfg is not None else os.getenv("SESSION_DB_PATH", "cache/sessions.sqlite"))
+    return _session_store
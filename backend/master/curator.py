@@ -1,12 +1,23 @@
 import asyncio
-import time
+from dataclasses import asdict
+from typing import Dict
+
 import pandas as pd
 from backend.config.config import Config
-from backend.context.compression import ContextCompressor
-from backend.master.prompts import generate_role_prompt, generate_subquery_role_prompt, fill_empty_value_prompt, empty_value_prompt
+from backend.context.compression import pretty_print_chunks
+from backend.context.packing import ContextPacker
+from backend.master.checkpoint import Session, checkpoint_key, get_session_store, page_refs, resolve_pages, stage_reached
+from backend.master.dataset_summary import DatasetSummary
+from backend.master.gap_filler import GapFiller
+from backend.master.row_store import RowStore
+from backend.master.url_planner import Candidate, UrlPlanner, terms
+from backend.master.prompts import generate_role_prompt, generate_row_prompt, generate_subquery_role_prompt
 from backend.memory.embeddings import Memory
-from backend.utils.functions import generate_row, get_retriever, get_sub_queries, scrape_urls, stream_output, summarize_dataframe
-from backend.utils.llm import create_chat_completion, parse_chat_completion_for_json
+from backend.scraper.cache import get_page_cache
+from backend.scraper.policy import get_fetch_policy
+from backend.utils.functions import generate_row, get_retriever, get_sub_queries, scrape_urls, stream_output
+from backend.utils.tracing import get_tracer
+from backend.utils.urls import canonicalize_url
 
 class Curator:
     def __init__(
@@ -17,7 +28,9 @@ class Curator:
          rows, 
          config_path=None, 
          websocket=None,
-         visited_urls=set()
+         visited_urls=None,
+         session_id=None,
+         context_mode=None
      ):
         self.query = query
         self.websocket = websocket
@@ -28,173 +41,344 @@ class Curator:
         self.columns = columns
         self.rows = rows
         self.existing_data = pd.DataFrame()
-        self.memory = Memory(self.cfg.embedding_provider)
-        self.visited_urls = visited_urls
+        self.memory = Memory(
+            self.cfg.embedding_provider,
+            cache_path=self.cfg.embedding_cache_path if self.cfg.embedding_cache else None,
+            index_type=self.cfg.memory_index,
+        )
+        self.visited_urls = set() if visited_urls is None else visited_urls
+        # Checkpoints of every completed stage, so an interrupted session resumes where it stopped
+        self.session = Session(get_session_store(self.cfg), session_id)
+        # Checkpointed pages point at the text in the page cache rather than holding a copy
+        self.page_cache = get_page_cache(self.cfg)
+        self.tracer = get_tracer(self.cfg)
+        # full: scrape the planned pages right away. snippet_first: work from search snippets, and only
+        # scrape the pages behind them for columns the snippets could not fill
+        self.context_mode = context_mode or self.cfg.context_mode
+        self.deferred: Dict[str, Candidate] = {}
+        self.fetch_stats = {"planned": 0, "fetched": 0}
+        self.context_packer = ContextPacker(
+            model=self.cfg.smart_llm_model,
+            budget=self.cfg.row_prompt_token_budget,
+        )
 
     async def conduct_research(self):
+        self.fetch_stats = await self.session.load("fetch_stats", self.fetch_stats)
+        stage = await self.session.stage()
+        if stage_reached(stage, "research"):
+            await stream_output("logs", "Resuming from the checkpointed research...", self.websocket)
+            self.context = await self.session.load("context", [])
+            if not stage_reached(stage, "filled"):
+                await self.restore_memory()
+            return
+
         self.context = await self.get_context_by_search(self.query)
-        print(f'Found context: {self.context}')
-        print(f'curator start cols: {self.columns}')
+        await self.session.save("context", self.context)
+        await self.session.complete("research")
         # else self.source_urls:
             #     self.context = await self.get_context_by_urls(self.source_urls)
 
-        time.sleep(2)
-
     async def get_context_by_urls(self, urls):
         new_search_urls = await self.get_new_urls(urls)
         await stream_output("logs", f"I will conduct my research based on the following urls: {new_search_urls}...", self.websocket)
-        scraped_sites = scrape_urls(new_search_urls, self.cfg)
+        scraped_sites = await scrape_urls(new_search_urls, self.cfg, query=self.relevance_query)
         web_results = await self.get_similar_content_by_query(self.query, scraped_sites)
         return web_results
 
     async def get_context_by_search(self, query):
-        print('hit')
         prompt = generate_subquery_role_prompt(self.columns)
-        print(f'prompt: {prompt}')
-        print(f'query: {query}')
-        print(f'cfg: {self.cfg}')
-
-        sub_queries = await get_sub_queries(query=query, agent_role_prompt=prompt, cfg=self.cfg) + [query]
-        print(f'sub queries: {sub_queries}')
+        checkpoint = f"sub_queries:{checkpoint_key(query)}"
+        sub_queries = await self.session.load(checkpoint)
+        if sub_queries is None:
+            with self.tracer.span("sub_queries") as span:
+                sub_queries = await get_sub_queries(query=query, agent_role_prompt=prompt, cfg=self.cfg) + [query]
+                span.set(queries=len(sub_queries))
+            await self.session.save(checkpoint, sub_queries)
         await stream_output("logs", f"I will conduct my research based on the following queries: {sub_queries}...", self.websocket)
 
-        content = []
-        for sub_query in sub_queries:
-            await stream_output("logs", f"\nRunning research for '{sub_query}'...", self.websocket)
-            scraped_sites = await self.scrape_sites_by_query(sub_query)
-            print(f"scraped sites: {scraped_sites}")
-            web_content = await self.get_similar_content_by_query(sub_query, scraped_sites)
+        checkpoint = f"research:{checkpoint_key(query)}"
+        restored = await self.session.load(checkpoint)
+        if restored is not None:
+            await stream_output("logs", f"\nRestored research for '{query}'", self.websocket)
+            pages = await asyncio.to_thread(resolve_pages, restored["pages"], self.page_cache)
+            await self.add_pages(pages, restored.get("snippets", []))
+            self.defer(Candidate(**candidate) for candidate in restored.get("deferred", []))
+            return restored["context"]
 
+        planned = await self.plan_urls(sub_queries)
+        pages, snippets, deferred = [], [], []
+        if self.context_mode == "snippet_first":
+            snippets = self.snippet_pages(planned)
+            deferred = planned
+            self.defer(deferred)
+            self.fetch_stats["planned"] += min(self.cfg.scrape_budget, len(planned))
+            await self.session.save("fetch_stats", self.fetch_stats)
+            await stream_output("logs", f"📝Using the snippets of {len(snippets)} search results, no pages scraped yet\n", self.websocket)
+        else:
+            pages = await self.scrape_planned_urls(planned)
+
+        # Every sub-query is matched against all the pages (or snippets) of the research, in sub-query order
+        await stream_output("logs", f"Getting relevant content for {len(sub_queries)} queries...", self.websocket)
+        await asyncio.to_thread(self.memory.add_pages, pages + snippets)
+        results = await asyncio.to_thread(self.memory.search_many, sub_queries, 8)
+        content = []
+        for sub_query, chunks in zip(sub_queries, results):
+            web_content = pretty_print_chunks(chunks)
             if web_content:
                 await stream_output("logs", f"{web_content}", self.websocket)
                 content.append(web_content)
             else:
                 await stream_output("logs", f"No content found for '{sub_query}'...", self.websocket)
-        print(f"Collected content: {content}")
 
+        await self.session.save(checkpoint, {
+            "query": query, "pages": page_refs(pages, self.page_cache), "snippets": snippets, "context": content,
+            "deferred": [asdict(c) for c in deferred],
+        })
         return content
 
+    async def plan_urls(self, sub_queries):
+        """
+        Searches every sub-query and ranks the documents found.
+        Urls are merged across sub-queries by canonical form, so mirrors and repeats count once.
+        Returns:
+            list: Candidates not scraped yet and not behind an open circuit breaker, best first
+        """
+        await stream_output("logs", f"🔎 Searching for {len(sub_queries)} queries...", self.websocket)
+        with self.tracer.span("search", queries=len(sub_queries)) as span:
+            results = await self.retriever.search_many(sub_queries, max_results=self.cfg.max_search_results_per_query)
+            planner = UrlPlanner(f"{self.query} {' '.join(self.columns)}")
+            for sub_query, sub_query_results in zip(sub_queries, results):
+                planner.add(sub_query, sub_query_results)
+            policy = get_fetch_policy(self.cfg)
+            planned = [candidate for candidate in planner.plan(exclude=self.visited_urls) if not policy.is_open(candidate.url)]
+            span.set(results=planner.num_results, unique_urls=len(planner.candidates), planned=len(planned))
+        return planned
+
+    async def scrape_planned_urls(self, planned, budget=None):
+        """Scrapes one global budget (by default `scrape_budget`) of the best planned candidates."""
+        budget = self.cfg.scrape_budget if budget is None else budget
+        # Among the best candidates, the slowest hosts give way to the spares
+        urls = get_fetch_policy(self.cfg).rank([candidate.url for candidate in planned[:budget + budget // 2]], budget)
+        new_urls = await self.get_new_urls(urls)
+        self.fetch_stats["fetched"] += len(new_urls)
+        await stream_output("logs", f"📝Scraping {len(new_urls)} of {len(planned)} candidate urls...\n", self.websocket)
+        return await scrape_urls(new_urls, self.cfg, query=self.relevance_query)
+
+    @property
+    def relevance_query(self):
+        """What scraped documents should be about: the research query and the table's columns."""
+        return " ".join([self.query, *map(str, self.columns or [])])
+
+    @staticmethod
+    def snippet_pages(planned, limit=36):
+        """Search snippets as pages, so they can be indexed and searched like scraped content."""
+        return [
+            {"url": candidate.url, "title": candidate.title, "raw_content": "\n".join([candidate.title, *candidate.snippets])}
+            for candidate in planned[:limit] if candidate.snippets
+        ]
+
+    def defer(self, candidates):
+        """Remembers candidates whose full pages were not scraped, keeping the best score of each."""
+        for candidate in candidates:
+            known = self.deferred.get(candidate.key)
+            if known is None or candidate.score > known.score:
+                self.deferred[candidate.key] = candidate
+
+    async def escalate(self, columns):
+        """
+        Scrapes the full pages behind deferred snippets, the ones mentioning `columns` first, and indexes them.
+        All the escalations of a run share a single `scrape_budget`.
+        Returns:
+            int: number of pages added
+        """
+        column_terms = terms(" ".join(columns))
+        candidates = [c for key, c in self.deferred.items() if key not in self.visited_urls]
+        remaining = self.cfg.scrape_budget - self.fetch_stats["fetched"]
+        if not candidates or remaining <= 0:
+            return 0
+
+        def relevance(candidate):
+            found = terms(" ".join([candidate.title, *candidate.snippets]))
+            return candidate.score + len(column_terms & found) / max(len(column_terms), 1)
+
+        candidates.sort(key=relevance, reverse=True)
+        await stream_output("logs", f"Fetching full pages for columns the snippets left unfilled: {columns}", self.websocket)
+        with self.tracer.span("escalate", columns=len(columns), candidates=len(candidates)) as span:
+            pages = await self.scrape_planned_urls(candidates, budget=remaining)
+            span.set(pages=len(pages))
+        await self.session.save("fetch_stats", self.fetch_stats)
+        self.deferred = {key: c for key, c in self.deferred.items() if key not in self.visited_urls}
+        await self.add_pages(pages)
+        await self.session.save(
+            f"research:escalation:{checkpoint_key(' '.join(page['url'] for page in pages))}",
+            {"query": " ".join(columns), "pages": page_refs(pages, self.page_cache), "context": []},
+        )
+        return len(pages)
+
+    async def add_pages(self, pages, snippets=()):
+        """Indexes checkpointed pages and snippets again, and marks the urls of the (scraped) pages as visited."""
+        self.visited_urls.update(canonicalize_url(page.get("url")) for page in pages)
+        await asyncio.to_thread(self.memory.add_pages, [*pages, *snippets])
+
+    async def restore_memory(self):
+        """Rebuilds the session's vector index from every checkpointed research pass (embeddings come from the cache)."""
+        researched = await self.session.load_prefix("research:")
+        refs = [page for research in researched for page in research["pages"]]
+        await self.add_pages(
+            await asyncio.to_thread(resolve_pages, refs, self.page_cache),
+            [snippet for research in researched for snippet in research.get("snippets", [])],
+        )
+
     async def get_new_urls(self, url_set_input):
+        """Drops urls whose canonical form was already scraped in this session."""
         new_urls = []
+        # Claimed before any await, so concurrent research on the same session cannot take a url twice
         for url in url_set_input:
-            if url not in self.visited_urls:
-                await stream_output("logs", f"Adding source url to research: {url}\n", self.websocket)
-                self.visited_urls.add(url)
+            key = canonicalize_url(url)
+            if key not in self.visited_urls:
+                self.visited_urls.add(key)
                 new_urls.append(url)
+        for url in new_urls:
+            await stream_output("logs", f"Adding source url to research: {url}\n", self.websocket)
         return new_urls
 
-    async def scrape_sites_by_query(self, sub_query):
-        retriever = self.retriever(sub_query)
-        search_results = retriever.search(max_results=self.cfg.max_search_results_per_query)
-        new_search_urls = await self.get_new_urls([url.get("href") for url in search_results])
-        await stream_output("logs", f"📝Scraping urls {new_search_urls}...\n", self.websocket)
-        scraped_content_results = scrape_urls(new_search_urls, self.cfg)
-        return scraped_content_results
-
     async def get_similar_content_by_query(self, query, pages):
         await stream_output("logs", f"Getting relevant content based on query: {query}...", self.websocket)
-        print(f"PAGES: {pages}")
-        context_compressor = ContextCompressor(documents=pages, embeddings=self.memory.get_embeddings())
-        return context_compressor.get_context(query, max_results=8)
+        # Splitting and embedding are blocking, keep them off the event loop.
+        # The query is matched against every page gathered so far in this session, not just its own.
+        await asyncio.to_thread(self.memory.add_pages, pages)
+        chunks = await asyncio.to_thread(self.memory.search, query, 8)
+        return pretty_print_chunks(chunks)
+
+    async def get_context_from_memory(self, query):
+        """
+        Answers a query from the session's vector index alone, without a new web search
+        Returns:
+            str: formatted context, or None when the index does not hold enough relevant chunks
+        """
+        chunks = await asyncio.to_thread(self.memory.search, query, 8, self.cfg.memory_min_score)
+        if len(chunks) < self.cfg.memory_min_hits:
+            return None
+        await stream_output("logs", f"Reusing {len(chunks)} already collected sources for: {query}", self.websocket)
+        return pretty_print_chunks(chunks)
+
     
     async def create_rows(self):
-        check_len = 0
+        store = RowStore(
+            self.columns,
+            key_columns=self.cfg.row_key_columns,
+            near_duplicate_threshold=self.cfg.row_near_duplicate_threshold,
+        )
+        summary = DatasetSummary(self.columns, key_columns=store.key_columns)
+        stalled = 0
         iter = 1
-        data_list = []
-
-        while check_len < self.rows:
-            if data_list:
-                dataset_cache = pd.DataFrame(data_list)
-                print(f'Dataset cache pre summary: {dataset_cache}')
-                print(f'Type of dataset_cache: {type(dataset_cache)}')
-                existing_dataset_str = await summarize_dataframe(dataset_cache)
-                # existing_dataset_str = 'test'
-                print(f'Markdown DF: {existing_dataset_str}')
+
+        restored = await self.session.load_table("rows")
+        if restored is not None:
+            for index, row in enumerate(store.extend(restored.to_dict("records"))):
+                summary.add(row)
+                await self.send_json({"type": "row_update", "id": index, "output": row})
+            if stage_reached(await self.session.stage(), "rows"):
+                return store.to_dataframe()
+
+        # Stop once enough unique rows exist, or when the model stops producing new ones
+        while len(store) < self.rows and stalled < self.cfg.row_stall_budget:
+            existing_dataset_str = summary.digest()
+
+            added = []
+
+            async def on_row(row):
+                # Rows are deduplicated and pushed to the client as soon as they are parsed
+                if len(store) < self.rows and store.add(row) is not None:
+                    added.append(row)
+                    summary.add(row)
+                    await self.send_json({"type": "row_update", "id": len(store) - 1, "output": row})
+
+            with self.tracer.span("row_generation", iteration=iter) as span:
+                context = await self.build_row_context(store, existing_dataset_str)
+                await generate_row(
+                    existing_data=existing_dataset_str,
+                    user_query=self.query,
+                    context=context,
+                    columns=self.columns,
+                    websocket=self.websocket,
+                    role_prompt=generate_role_prompt(),  # existing data
+                    cfg=self.cfg,
+                    on_row=on_row
+                )
+                span.set(added=len(added), unique=len(store), rejected=sum(store.rejected.values()))
+
+            if added:
+                stalled = 0
             else:
-                existing_dataset_str = "Nothing has been collected yet."
-                print("Markdown DF: DataFrame is empty. First pass.")
-
-            print(f'pass in context: {self.context}')
-
-            dataset = await generate_row(
-                existing_data=existing_dataset_str,
-                user_query=self.query,
-                context=self.context,
-                columns=self.columns,
-                websocket=self.websocket,
-                role_prompt=generate_role_prompt(),  # existing data
-                cfg=self.cfg
-            )
-
-            print(f'pass {iter}: {dataset}')
-
-            new_data = await parse_chat_completion_for_json(dataset)
-            await asyncio.sleep(0)  # Ensures new_data is fully instantiated before proceeding
-            new_data.reset_index(drop=True, inplace=True)
-
-            print(f'Existing data:\n{pd.DataFrame(data_list)}')
-            print(f'New data:\n{new_data}')
-            print(f"Type of existing_data: {type(pd.DataFrame(data_list)) if data_list else 'None'}, columns: {pd.DataFrame(data_list).columns if data_list else 'None'}")
-            print(f"Type of new_data: {type(new_data)}, columns: {new_data.columns}")
-
-            if new_data.empty:
-                print("New data is empty, skipping this iteration.")
-                continue
-
-            # new_data_dict = new_data.to_dict('records')
-            data_list.extend(new_data.to_dict('records'))
-            print(f'data list: {data_list}')
-            
-            # Remove duplicates manually since we are not using pandas
-            # data_list = [dict(t) for t in {tuple(d.items()) for d in data_list}]
-            
-            check_len = len(data_list)
-            print(f'Updated existing data:\n{pd.DataFrame(data_list)}')
-
-        output_dataset = pd.DataFrame(data_list)
-        return output_dataset
+                stalled += 1
+                await stream_output("logs", f"No new unique rows on pass {iter} ({stalled}/{self.cfg.row_stall_budget})", self.websocket)
+            iter += 1
+            await self.session.save_table("rows", store.to_dataframe())
+
+        await self.session.complete("rows")
+        return store.to_dataframe()
+
+    async def build_row_context(self, store, existing_data):
+        """
+        Context for one row generation pass, packed into the prompt token budget.
+        Chunks are ranked against the columns that are still least filled, so each pass
+        spends its input tokens where the dataset has gaps.
+        """
+        if not len(self.memory):
+            return self.context
+        columns = store.underfilled_columns() if len(store) else self.columns
+        chunks = await asyncio.to_thread(
+            self.memory.search, f"{self.query} {' '.join(columns)}", self.cfg.row_prompt_max_chunks, 0.0
+        )
+        base_prompt = generate_role_prompt() + generate_row_prompt("", self.columns, existing_data, self.query)
+        packed = self.context_packer.pack(chunks, reserved_tokens=self.context_packer.count(base_prompt))
+        return pretty_print_chunks(packed)
+
+    async def send_json(self, message):
+        if self.websocket:
+            await self.websocket.send_json(message)
 
     async def fill_empty_rows(self, dataset: pd.DataFrame) -> pd.DataFrame:
-        iter = 0
-        final_dataset = dataset.copy()
-        await self.websocket.send_json({"type": "row_count", "output": final_dataset.shape[0]})
-        final_dataset.fillna('Not found', inplace=True)
-        for index, row in final_dataset.iterrows():
-            for column in final_dataset.columns:
-                print(f'column iter: {column}')
-                if pd.isnull(row[column]) or row[column] == 'Not found':
-                    row_str = row.to_markdown(tablefmt="github")
-                    print(f'Row to prompt: {row_str}')
-
-                    new_context = await self.get_context_by_search(row_str)
-                    role_prompt = generate_role_prompt()
-                    print(f'role prompt: {role_prompt}')
-                    generate_value_prompt = fill_empty_value_prompt(new_context, self.query, row, column)
-                    print(f'gen value prompt: {generate_value_prompt}')
-                    value = await create_chat_completion(
-                            model=self.cfg.smart_llm_model,
-                            messages=[
-                                {"role": "system", "content": f"{role_prompt}"},
-                                {"role": "user", "content": generate_value_prompt}
-                            ],
-                            temperature=0,
-                            llm_provider=self.cfg.llm_provider,
-                            stream=True,
-                            websocket=self.websocket,
-                            max_tokens=self.cfg.smart_token_limit
-                        )
-                    print(f'generated value: {value}')
-
-                    if value:
-                        final_dataset.at[index, column] = value
-                        updated_row = final_dataset.iloc[index].to_dict()
-                        row_id = index
-                        print(f'row_id {row_id}, iteration {iter}')
-                        await self.websocket.send_json({"type": "row_update", "id": row_id, "output": updated_row})
-                        iter += 1
-                else:
-                    row_id = index
-                    current_row = final_dataset.iloc[index].to_dict()
-                    await self.websocket.send_json({"type": "row_update", "id": row_id, "output": current_row})
-
-        return final_dataset
\ No newline at end of file
+        gap_filler = GapFiller(
+            self,
+            grouping=self.cfg.gap_fill_grouping,
+            concurrency=self.cfg.gap_fill_concurrency,
+        )
+        # A partially filled table picks up where it stopped, a finished one is only sent again
+        filled = await self.session.load_table("filled")
+        if filled is not None and stage_reached(await self.session.stage(), "filled"):
+            await gap_filler.send_table(filled)
+            return filled
+        final_dataset = dataset if filled is None else filled
+        snippet_first = self.context_mode == "snippet_first"
+
+        if snippet_first and filled is None:
+            weak_columns = self.low_confidence_columns(final_dataset)
+            if weak_columns:
+                await self.escalate(weak_columns)
+        final_dataset = await gap_filler.fill(final_dataset)
+        if snippet_first:
+            missing_columns = [c for c in final_dataset.columns if final_dataset[c].map(GapFiller.is_empty).any()]
+            if missing_columns and await self.escalate(missing_columns):
+                final_dataset = await gap_filler.fill(final_dataset)
+            await self.report_fetches()
+
+        await self.session.save_table("filled", final_dataset)
+        await self.session.complete("filled")
+        return final_dataset
+
+    def low_confidence_columns(self, dataset: pd.DataFrame):
+        """Columns filled in less than `snippet_min_fill` of the rows."""
+        if dataset.empty:
+            return list(self.columns)
+        return [
+            column for column in dataset.columns
+            if 1 - dataset[column].map(GapFiller.is_empty).mean() < self.cfg.snippet_min_fill
+        ]
+
+    async def report_fetches(self):
+        planned, fetched = self.fetch_stats["planned"], self.fetch_stats["fetched"]
+        saved = max(planned - fetched, 0)
+        await stream_output("logs", f"Snippet-first context saved {saved} of {planned} page fetches ({fetched} pages scraped)", self.websocket)
+        await self.send_json({"type": "fetch_report", "output": {"planned": planned, "fetched": fetched, "saved": saved}})
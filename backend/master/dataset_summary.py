@@ -0,0 +1,64 @@
+from typing import Dict, Iterable, List
+
+from backend.master.row_store import EMPTY_VALUE, normalize_value
+
+
+class DatasetSummary:
+    """
+    Running per-column statistics over the rows collected so far.
+    Updating costs O(new rows) and the digest is deterministic, so repeated prompts stay
+    identical (and cacheable) when nothing new was collected.
+    """
+    def __init__(self, columns, key_columns=None, max_key_values=200):
+        self.columns = list(columns)
+        self.key_columns = [c for c in (key_columns or self.columns[:1]) if c in self.columns] or self.columns
+        self.max_key_values = max_key_values
+        self.num_rows = 0
+        self.filled = {c: 0 for c in self.columns}
+        self.distinct = {c: set() for c in self.columns}
+        self._key_values: List[str] = []
+        self._key_values_seen = set()
+
+    def add(self, row: Dict):
+        self.num_rows += 1
+        for column in self.columns:
+            value = row.get(column)
+            normalized = normalize_value(value)
+            if normalized in ("", normalize_value(EMPTY_VALUE)):
+                continue
+            self.filled[column] += 1
+            self.distinct[column].add(normalized)
+        key = " / ".join(str(row.get(c)) for c in self.key_columns if normalize_value(row.get(c)))
+        if key and key not in self._key_values_seen:
+            self._key_values_seen.add(key)
+            self._key_values.append(key)
+        return self
+
+    def update(self, rows: Iterable[Dict]):
+        for row in rows:
+            self.add(row)
+        return self
+
+    def digest(self) -> str:
+        """
+        Returns:
+            str: a compact markdown digest telling the model what has been collected and what to avoid
+        """
+        if not self.num_rows:
+            return "Nothing has been collected yet."
+        column_lines = "\n".join(
+            f"- {c}: {len(self.distinct[c])} distinct, {self.filled[c] / self.num_rows:.0%} filled"
+            for c in self.columns
+        )
+        # The most recent keys are listed once there are too many to include them all
+        keys = self._key_values[-self.max_key_values:]
+        omitted = len(self._key_values) - len(keys)
+        omitted_note = f" (and {omitted} earlier)" if omitted else ""
+        return (
+            f"## Dataframe Summary\n\n"
+            f"Number of Rows: {self.num_rows:,}\n\n"
+            f"Number of Columns: {len(self.columns):,}\n\n"
+            f"### Column Information\n\n{column_lines}\n\n"
+            f"### Already collected {', '.join(self.key_columns)} values, DO NOT repeat these{omitted_note}\n\n"
+            f"{'; '.join(keys)}"
+        )
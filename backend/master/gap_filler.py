@@ -0,0 +1,149 @@
+import asyncio
+from collections import defaultdict
+
+import pandas as pd
+from colorama import Fore, Style
+
+from backend.llm_provider import Priority
+from backend.master.prompts import generate_role_prompt, fill_empty_row_values_prompt, fill_empty_column_values_prompt
+from backend.master.row_store import EMPTY_VALUE
+from backend.utils.llm import create_chat_completion, parse_json_response
+from backend.utils.tracing import get_tracer
+
+
+class GapFiller:
+    """
+    Fills the 'Not found' cells of a dataset.
+    Missing cells are grouped (by row, or by column across rows), each group gets a single
+    research pass and a single JSON completion, and groups run concurrently.
+    """
+    def __init__(self, curator, grouping="row", concurrency=4, max_group_rows=20):
+        self.curator = curator
+        self.cfg = curator.cfg
+        self.websocket = curator.websocket
+        self.grouping = grouping
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_group_rows = max_group_rows
+        # Checkpoints are written in the order they were taken, so an older snapshot never overwrites a newer one
+        self.checkpoint_lock = asyncio.Lock()
+
+    @staticmethod
+    def is_empty(value):
+        return pd.isnull(value) or value == EMPTY_VALUE
+
+    async def fill(self, dataset: pd.DataFrame) -> pd.DataFrame:
+        final_dataset = dataset.copy()
+        final_dataset.fillna(EMPTY_VALUE, inplace=True)
+        await self.send_json({"type": "row_count", "output": final_dataset.shape[0]})
+
+        missing = defaultdict(list)
+        for index, row in final_dataset.iterrows():
+            missing_columns = [column for column in final_dataset.columns if self.is_empty(row[column])]
+            if missing_columns:
+                missing[index] = missing_columns
+            else:
+                await self.send_row(final_dataset, index)
+
+        if self.grouping == "column":
+            tasks = [
+                self.fill_column(final_dataset, column, indexes)
+                for column, indexes in self.group_by_column(missing)
+            ]
+        else:
+            tasks = [self.fill_row(final_dataset, index, columns) for index, columns in missing.items()]
+
+        missing_cells = sum(len(columns) for columns in missing.values())
+        with get_tracer(self.cfg).span("gap_fill", grouping=self.grouping, groups=len(tasks), missing_cells=missing_cells) as span:
+            await asyncio.gather(*tasks)
+            still_missing = sum(self.is_empty(final_dataset.at[index, column]) for index, columns in missing.items() for column in columns)
+            span.set(filled_cells=missing_cells - int(still_missing))
+        return final_dataset
+
+    def group_by_column(self, missing):
+        by_column = defaultdict(list)
+        for index, columns in missing.items():
+            for column in columns:
+                by_column[column].append(index)
+        for column, indexes in by_column.items():
+            for i in range(0, len(indexes), self.max_group_rows):
+                yield column, indexes[i:i + self.max_group_rows]
+
+    async def fill_row(self, dataset, index, columns):
+        """One research pass and one completion for all missing values of a row."""
+        async with self.semaphore:
+            row = dataset.loc[index]
+            row_str = row.to_markdown(tablefmt="github")
+            context = await self.research(row_str)
+            prompt = fill_empty_row_values_prompt(context, self.curator.query, row.to_dict(), columns)
+            values = await self.complete_json(prompt)
+
+            for column in columns:
+                value = values.get(column)
+                if value not in (None, "") and not self.is_empty(value):
+                    dataset.at[index, column] = value
+            await self.send_row(dataset, index)
+            await self.checkpoint(dataset)
+
+    async def fill_column(self, dataset, column, indexes):
+        """One research pass and one completion for a column's missing values across several rows."""
+        async with self.semaphore:
+            rows = {index: dataset.loc[index].to_dict() for index in indexes}
+            known_values = [
+                " ".join(str(v) for k, v in row.items() if k != column and not self.is_empty(v))
+                for row in rows.values()
+            ]
+            query = f"{self.curator.query} {column}: " + "; ".join(known_values)
+            context = await self.research(query)
+            prompt = fill_empty_column_values_prompt(context, self.curator.query, column, rows)
+            values = await self.complete_json(prompt)
+
+            for index in indexes:
+                value = values.get(str(index))
+                if value not in (None, "") and not self.is_empty(value):
+                    dataset.at[index, column] = value
+                await self.send_row(dataset, index)
+            await self.checkpoint(dataset)
+
+    async def research(self, query):
+        """Searches the session's index first, only going back to the web when it comes up short."""
+        context = await self.curator.get_context_from_memory(query)
+        if context is None:
+            context = await self.curator.get_context_by_search(query)
+        return context
+
+    async def complete_json(self, prompt):
+        try:
+            response = await create_chat_completion(
+                model=self.cfg.smart_llm_model,
+                messages=[
+                    {"role": "system", "content": f"{generate_role_prompt()}"},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0,
+                llm_provider=self.cfg.llm_provider,
+                max_tokens=self.cfg.smart_token_limit,
+                priority=Priority.INTERACTIVE
+            )
+            values = parse_json_response(response)
+            return values if isinstance(values, dict) else {}
+        except Exception as e:
+            print(f"{Fore.RED}Error in gap filling: {e}{Style.RESET_ALL}")
+            return {}
+
+    async def checkpoint(self, dataset):
+        """Saves the partially filled table, copied first since other groups keep writing to it."""
+        snapshot = dataset.copy()
+        async with self.checkpoint_lock:
+            await self.curator.session.save_table("filled", snapshot)
+
+    async def send_table(self, dataset):
+        await self.send_json({"type": "row_count", "output": dataset.shape[0]})
+        for index in dataset.index:
+            await self.send_row(dataset, index)
+
+    async def send_row(self, dataset, index):
+        await self.send_json({"type": "row_update", "id": index, "output": dataset.loc[index].to_dict()})
+
+    async def send_json(self, message):
+        if self.websocket:
+            await self.websocket.send_json(message)
@@ -58,6 +58,18 @@ def fill_empty_value_prompt(data, user_query, row_values, column_header):
            f"Your task is to return the appropriate value for the column header provided with the following information: {data}" \
            "ONLY return the row value for the provided column header and nothing else."
 
+def fill_empty_row_values_prompt(data, user_query, row_values, column_headers):
+    return f"Given the following row from a dataset: {row_values}, the user's goal: {user_query}, and the column headers with missing values: {column_headers}." \
+           f"Your task is to find the appropriate value for each of those column headers with the following information: {data}" \
+           "RETURN VALID JSON as a single object mapping each of the provided column headers to its value. " \
+           "If no appropriate value can be found for a column header, use: 'Not found'. DO NOT add other keys."
+
+def fill_empty_column_values_prompt(data, user_query, column_header, rows):
+    return f"Given the following column header: {column_header}, the user's goal: {user_query}, and these rows from a dataset keyed by row id: {rows}." \
+           f"Your task is to find the appropriate {column_header} value for each row with the following information: {data}" \
+           "RETURN VALID JSON as a single object mapping each row id (as a string) to its value. " \
+           "If no appropriate value can be found for a row, use: 'Not found'. DO NOT add other keys."
+
 def empty_value_prompt(row: str, max_iterations: int=3):
     prompt = {
         "task": f"Write {max_iterations} google search queries to search online that can help fill in missing values for this dataframe row: \"{row}\"",
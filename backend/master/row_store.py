@@ -0,0 +1,141 @@
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+EMPTY_VALUE = 'Not found'
+_MERSENNE_PRIME = (1 << 61) - 1
+_non_word = re.compile(r"[^\w\s]")
+_spaces = re.compile(r"\s+")
+
+
+def normalize_value(value) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    text = _non_word.sub(" ", str(value).lower())
+    return _spaces.sub(" ", text).strip()
+
+
+class MinHasher:
+    """
+    MinHash signatures over character shingles, used to estimate Jaccard similarity.
+    """
+    def __init__(self, num_perm=64, shingle_size=3, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text):
+        if len(text) <= self.shingle_size:
+            return {text}
+        return {text[i:i + self.shingle_size] for i in range(len(text) - self.shingle_size + 1)}
+
+    def signature(self, text) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in self.shingles(text)), dtype=np.uint64)
+        # (a * x + b) mod p for every permutation and shingle, then the min per permutation
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+
+class RowStore:
+    """
+    Accumulates generated rows with an incremental dedup index.
+    Rows are deduplicated on their key columns: exactly (normalized key hash) and approximately
+    (MinHash over shingles, bucketed with LSH banding so each insert only checks a few candidates).
+    """
+    def __init__(self, columns, key_columns=None, near_duplicate_threshold=0.8, num_perm=64, bands=16):
+        self.columns = list(columns)
+        self.key_columns = [c for c in (key_columns or self.columns[:1]) if c in self.columns] or self.columns
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.bands = bands
+        self.band_size = num_perm // bands
+        self._rows: List[Dict] = []
+        self._exact_keys = set()
+        self._signatures: List[np.ndarray] = []
+        self._buckets = defaultdict(list)
+        self.rejected = {"exact": 0, "near": 0, "empty": 0}
+        self.filled = {c: 0 for c in self.columns}
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def rows(self):
+        return self._rows
+
+    def _key_text(self, row):
+        empty = normalize_value(EMPTY_VALUE)
+        values = [normalize_value(row.get(c)) for c in self.key_columns]
+        if not any(v and v != empty for v in values):
+            # Key columns are unknown, fall back to the known cells of the row. Placeholder cells are left out,
+            # or mostly empty rows would share most of their shingles and look like near-duplicates.
+            values = [
+                f"{normalize_value(c)}: {value}"
+                for c, value in ((c, normalize_value(row.get(c))) for c in self.columns)
+                if value and value != empty
+            ]
+        return " | ".join(values)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.band_size:(band + 1) * self.band_size]
+            yield band, hashlib.blake2b(chunk.tobytes(), digest_size=8).digest()
+
+    def _is_near_duplicate(self, signature):
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        return any(
+            np.mean(self._signatures[i] == signature) >= self.near_duplicate_threshold
+            for i in candidates
+        )
+
+    def add(self, row: Dict) -> Optional[Dict]:
+        """
+        Adds a row unless it duplicates one already stored
+        Returns:
+            dict: the stored row (restricted to the store's columns), or None if it was rejected
+        """
+        row = {c: row.get(c, EMPTY_VALUE) for c in self.columns}
+        key_text = self._key_text(row)
+        if not key_text.replace("|", "").strip():
+            self.rejected["empty"] += 1
+            return None
+        exact_key = hashlib.sha1(key_text.encode("utf-8")).hexdigest()
+        if exact_key in self._exact_keys:
+            self.rejected["exact"] += 1
+            return None
+        signature = self.hasher.signature(key_text)
+        if self._is_near_duplicate(signature):
+            self.rejected["near"] += 1
+            return None
+
+        index = len(self._rows)
+        self._rows.append(row)
+        for column, value in row.items():
+            if normalize_value(value) not in ("", normalize_value(EMPTY_VALUE)):
+                self.filled[column] += 1
+        self._exact_keys.add(exact_key)
+        self._signatures.append(signature)
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].append(index)
+        return row
+
+    def extend(self, rows) -> List[Dict]:
+        """Adds rows in order, returns the ones that were kept."""
+        return [kept for kept in (self.add(row) for row in rows) if kept is not None]
+
+    def underfilled_columns(self) -> List[str]:
+        """Columns that still have missing values, emptiest first. All columns when nothing is missing."""
+        columns = sorted((c for c in self.columns if self.filled[c] < len(self._rows)), key=lambda c: self.filled[c])
+        return columns or self.columns
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self._rows, columns=self.columns)
@@ -0,0 +1,90 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+
+from backend.utils.urls import canonicalize_url, is_mirror_url
+
+_word = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it", "of", "on", "or",
+    "that", "the", "this", "to", "what", "when", "where", "which", "who", "with",
+}
+
+
+def terms(text) -> set:
+    return {word for word in _word.findall(str(text).lower()) if word not in STOPWORDS and len(word) > 1}
+
+
+@dataclass
+class Candidate:
+    """One document found by the searches, with every url, snippet and query rank that pointed at it."""
+    key: str
+    url: str
+    title: str = ""
+    snippets: List[str] = field(default_factory=list)
+    ranks: Dict[str, int] = field(default_factory=dict)
+    score: float = 0.0
+
+    def as_result(self) -> Dict:
+        """The candidate in search result form, with its snippets merged."""
+        return {"href": self.url, "body": " ... ".join(self.snippets), "title": self.title}
+
+
+class UrlPlanner:
+    """
+    Collects the search results of every sub-query before anything is scraped.
+    Urls that canonicalize to the same document are merged (keeping all their snippets), and candidates are
+    ranked by reciprocal rank fusion across queries plus snippet term overlap with the research topic,
+    so one global budget of the best documents can be scraped once.
+    """
+    def __init__(self, topic, snippet_weight=0.5, rrf_k=60):
+        self.topic_terms = terms(topic)
+        self.snippet_weight = snippet_weight
+        self.rrf_k = rrf_k
+        self.candidates: Dict[str, Candidate] = {}
+        self.num_results = 0
+
+    def add(self, query, results: Iterable[Dict]):
+        for rank, result in enumerate(results):
+            url = result.get("href")
+            if not url:
+                continue
+            self.num_results += 1
+            key = canonicalize_url(url)
+            candidate = self.candidates.get(key)
+            if candidate is None:
+                candidate = self.candidates[key] = Candidate(key=key, url=url, title=result.get("title", ""))
+            elif is_mirror_url(candidate.url) and not is_mirror_url(url):
+                # Fetch the https, non-mobile, non-AMP spelling when the results offer one
+                candidate.url = url
+            snippet = (result.get("body") or "").strip()
+            if snippet and snippet not in candidate.snippets:
+                candidate.snippets.append(snippet)
+            candidate.ranks[query] = min(rank, candidate.ranks.get(query, rank))
+
+    def score(self, candidate: Candidate) -> float:
+        # Reciprocal rank fusion, scaled so a single first place scores 1
+        fusion = sum((self.rrf_k + 1) / (self.rrf_k + 1 + rank) for rank in candidate.ranks.values())
+        overlap = 0.0
+        if self.topic_terms:
+            found = terms(" ".join([candidate.title, *candidate.snippets]))
+            overlap = len(self.topic_terms & found) / len(self.topic_terms)
+        return fusion + self.snippet_weight * overlap
+
+    def plan(self, exclude: Iterable[str] = ()) -> List[Candidate]:
+        """
+        Args:
+            exclude: canonical keys of documents already scraped
+
+        Returns:
+            list: new candidates, best first
+        """
+        excluded = set(exclude)
+        ranked = []
+        for candidate in self.candidates.values():
+            if candidate.key in excluded:
+                continue
+            candidate.score = self.score(candidate)
+            ranked.append(candidate)
+        ranked.sort(key=lambda c: c.score, reverse=True)
+        return ranked
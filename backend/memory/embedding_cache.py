@@ -0,0 +1,124 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+from backend.utils.sqlite import SQLiteStore
+from backend.utils.tracing import annotate
+
+
+def embedding_model_name(embeddings) -> str:
+    return (
+        getattr(embeddings, "model", None)
+        or getattr(embeddings, "model_name", None)
+        or type(embeddings).__name__
+    )
+
+
+class EmbeddingStore(SQLiteStore):
+    """
+    On-disk store of chunk embeddings, keyed by (embedding model, sha256 of the chunk text).
+    Vectors are kept as raw float32 blobs in SQLite, with a small in-process LRU in front.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS embeddings ("
+        "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)",
+    )
+
+    def __init__(self, path, memory_items=50_000):
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        super().__init__(path)
+
+    @staticmethod
+    def key(model, text):
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+        missing = [key for key in keys if key not in found]
+        if not missing:
+            return found
+        with closing(self._connect()) as conn:
+            for i in range(0, len(missing), 500):
+                batch = missing[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        with self._lock:
+            for key in missing:
+                if key in found:
+                    self._remember(key, found[key])
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        rows = []
+        with self._lock:
+            for key, vector in items.items():
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((key, vector.shape[0], vector.tobytes()))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO embeddings (key, dim, vector) VALUES (?, ?, ?)", rows)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings provider so each document chunk is embedded at most once.
+    Query embeddings are always computed, they are cheap and rarely repeat.
+    """
+    def __init__(self, embeddings: Embeddings, store: EmbeddingStore):
+        self.embeddings = embeddings
+        self.store = store
+        self.model = embedding_model_name(embeddings)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingStore.key(self.model, text) for text in texts]
+        found = self.store.get_many(list(set(keys)))
+
+        # Embed each missing text once, even if it appears several times in the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        annotate(cache_hits=len(found), embedded=len(missing))
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing.keys(), vectors)}
+            self.store.put_many(new)
+            found.update(new)
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+_embedding_store: Optional[EmbeddingStore] = None
+
+
+def get_embedding_store(path) -> EmbeddingStore:
+    """Gets the process-wide embedding store."""
+    global _embedding_store
+    if _embedding_store is None or _embedding_store.path != path:
+        _embedding_store = EmbeddingStore(path)
+    return _embedding_store
@@ -1,8 +1,23 @@
-from langchain.vectorstores import FAISS
+import threading
+
+import numpy as np
+
+from backend.context.compression import split_pages
+from backend.context.similarity import normalize_rows, score, score_many, top_k_above_threshold
+from backend.utils.tracing import get_tracer
+from .embedding_cache import CachedEmbeddings, get_embedding_store
+
+try:
+    import faiss
+except ImportError:  # pragma: no cover - faiss is optional, fall back to brute force numpy search
+    faiss = None
 
 
 class Memory:
-    def __init__(self, embedding_provider, **kwargs):
+    """
+    Embeddings provider plus an incremental vector index of every chunk scraped in a research session.
+    """
+    def __init__(self, embedding_provider, cache_path=None, index_type="flat", **kwargs):
 
         _embeddings = None
         match embedding_provider:
@@ -19,7 +34,125 @@ class Memory:
             case _:
                 raise Exception("Embedding provider not found.")
 
+        if cache_path:
+            _embeddings = CachedEmbeddings(_embeddings, get_embedding_store(cache_path))
+
         self._embeddings = _embeddings
+        self.index_type = index_type
+        self._index = None
+        self._vectors = None
+        self._chunks = []
+        self._chunk_keys = set()
+        # Chunks being embedded by another call, indexed only once their vectors are in
+        self._pending_keys = set()
+        self._lock = threading.Lock()
 
     def get_embeddings(self):
         return self._embeddings
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def _new_index(self, dim):
+        if self.index_type == "hnsw":
+            return faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+        return faiss.IndexFlatIP(dim)
+
+    def add_pages(self, pages):
+        """
+        Splits, embeds and indexes scraped pages. Chunks already in the index are skipped.
+        Args:
+            pages: list of dicts with 'url' and 'raw_content'
+
+        Returns:
+            int: number of chunks added
+        """
+        # Splitting runs outside the lock, large batches go to the CPU pool
+        page_chunks = split_pages(pages)
+        chunks, keys = [], []
+        with self._lock:
+            for chunk in page_chunks:
+                key = (chunk["source"], chunk["content"])
+                if key in self._chunk_keys or key in self._pending_keys:
+                    continue
+                self._pending_keys.add(key)
+                chunks.append(chunk)
+                keys.append(key)
+        if not chunks:
+            return 0
+
+        try:
+            texts = [c["content"] for c in chunks]
+            with get_tracer().span("embed", chunks=len(texts), chars=sum(len(text) for text in texts)):
+                vectors = normalize_rows(self._embeddings.embed_documents(texts))
+            with self._lock:
+                if faiss is not None:
+                    if self._index is None:
+                        self._index = self._new_index(vectors.shape[1])
+                    self._index.add(vectors)
+                else:
+                    self._vectors = vectors if self._vectors is None else np.vstack([self._vectors, vectors])
+                self._chunks.extend(chunks)
+                self._chunk_keys.update(keys)
+        finally:
+            # On failure the chunks are released, so a later call can index them
+            with self._lock:
+                self._pending_keys.difference_update(keys)
+        return len(chunks)
+
+    def search(self, query, k=8, threshold=0.20):
+        """
+        Top-k lookup over everything indexed so far
+        Args:
+            query: query text
+            k: maximum number of chunks to return
+            threshold: minimum cosine similarity
+
+        Returns:
+            list: chunk dicts with 'source', 'title', 'content' and 'score', best first
+        """
+        if not self._chunks:
+            return []
+        with get_tracer().span("filter", indexed=len(self._chunks), k=k) as span:
+            query_vector = normalize_rows(self._embeddings.embed_query(query))
+            with self._lock:
+                if self._index is not None:
+                    scores, ids = self._index.search(query_vector[None, :], min(k, len(self._chunks)))
+                    hits = [(i, s) for i, s in zip(ids[0], scores[0]) if i >= 0 and s > threshold]
+                else:
+                    scores = score(self._vectors, query_vector)
+                    hits = [(i, scores[i]) for i in top_k_above_threshold(scores, k, threshold)]
+                span.set(hits=len(hits))
+                return [dict(self._chunks[i], score=float(s)) for i, s in hits]
+
+    def search_many(self, queries, k=8, threshold=0.20):
+        """
+        Top-k lookup of several queries at once: they are embedded in one call and scored with one
+        matrix-matrix product (or one faiss search over the stacked queries)
+        Args:
+            queries: query texts
+            k: maximum number of chunks to return per query
+            threshold: minimum cosine similarity
+
+        Returns:
+            list: one list of chunk dicts per query, in query order, each best first
+        """
+        if not queries or not self._chunks:
+            return [[] for _ in queries]
+        with get_tracer().span("filter", indexed=len(self._chunks), k=k, queries=len(queries)) as span:
+            # embed_documents batches the queries into one provider call
+            query_matrix = normalize_rows(self._embeddings.embed_documents(list(queries)))
+            with self._lock:
+                if self._index is not None:
+                    all_scores, all_ids = self._index.search(query_matrix, min(k, len(self._chunks)))
+                    hits = [
+                        [(i, s) for i, s in zip(ids, scores) if i >= 0 and s > threshold]
+                        for ids, scores in zip(all_ids, all_scores)
+                    ]
+                else:
+                    hits = [
+                        [(i, scores[i]) for i in top_k_above_threshold(scores, k, threshold)]
+                        for scores in score_many(self._vectors, query_matrix)
+                    ]
+                span.set(hits=sum(len(query_hits) for query_hits in hits))
+                return [[dict(self._chunks[i], score=float(s)) for i, s in query_hits] for query_hits in hits]
@@ -1,14 +1,17 @@
 from backend.master.curator import Curator
+from backend.utils.tracing import get_tracer
 from fastapi import WebSocket
 
 class DataTable:
-    def __init__(self, query: str, source_urls, columns, rows, config_path: str, websocket: WebSocket):
+    def __init__(self, query: str, source_urls, columns, rows, config_path: str, websocket: WebSocket, session_id=None, context_mode=None):
         self.query = query
         self.source_urls = source_urls
         self.columns = columns
         self.rows = rows
         self.config_path = config_path
         self.websocket = websocket
+        self.session_id = session_id
+        self.context_mode = context_mode
 
     async def run(self):
         researcher = Curator(
@@ -17,16 +20,20 @@ class DataTable:
             columns=self.columns, 
             rows=self.rows, 
             config_path=self.config_path, 
-            websocket=self.websocket
+            websocket=self.websocket,
+            session_id=self.session_id,
+            context_mode=self.context_mode
         )
-        print(f'table start cols: {self.columns}')
+        tracer = get_tracer(researcher.cfg)
+        with tracer.span("run", columns=len(self.columns), target_rows=self.rows, context_mode=researcher.context_mode):
+            with tracer.span("research"):
+                await researcher.conduct_research()
 
-        await researcher.conduct_research()
+            with tracer.span("create_rows") as span:
+                dataset = await researcher.create_rows()
+                span.set(rows=len(dataset))
 
-        dataset = await researcher.create_rows()
-
-        final_dataset = await researcher.fill_empty_rows(dataset)
-
-        print(f'Run successful: {final_dataset}')
+            with tracer.span("fill_empty_rows"):
+                final_dataset = await researcher.fill_empty_rows(dataset)
 
         return final_dataset
@@ -1,5 +1,8 @@
-from .searx.searx import SearxSearch
+from .searx.searx import SearxClient, SearxSearch, close_searx_client, get_searx_client
 
 __all__ = [
-    "SearxSearch"
+    "SearxSearch",
+    "SearxClient",
+    "get_searx_client",
+    "close_searx_client",
 ]
@@ -1,7 +1,164 @@
-
 # libraries
+import asyncio
 import os
-from langchain.utilities import SearxSearchWrapper
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from colorama import Fore, Style
+
+_spaces = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _spaces.sub(" ", query.lower()).strip()
+
+
+class SearxClient:
+    """
+    Async SearxNG client: pooled connections, a TTL'd result cache keyed by normalized query and
+    engine set, and a cap on the number of requests in flight to the instance.
+    """
+    def __init__(self, host, engines=None, concurrency=4, ttl=3600, max_entries=2048, timeout=10.0):
+        self.host = host.rstrip("/")
+        self.engines = tuple(sorted(engines or ()))
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.counters = {"hits": 0, "misses": 0, "errors": 0}
+        self._cache: "OrderedDict[Tuple, Tuple[float, List[Dict]]]" = OrderedDict()
+        self._pending: Dict[Tuple, asyncio.Future] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            # Pooled connections and the semaphore are bound to the loop that created them
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._pending.clear()
+            self._loop = loop
+        return self._client
+
+    def _cache_get(self, key) -> Optional[List[Dict]]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, results = entry
+        if time.time() >= expires_at:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return results
+
+    def _cache_put(self, key, results):
+        self._cache[key] = (time.time() + self.ttl, results)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _fetch(self, query) -> List[Dict]:
+        params = {"q": query, "format": "json"}
+        if self.engines:
+            params["engines"] = ",".join(self.engines)
+        client = self._http()
+        async with self._semaphore:
+            response = await client.get(f"{self.host}/search", params=params)
+        response.raise_for_status()
+        # Normalizing results to match the format of the other search APIs
+        return [
+            {"href": result["url"], "body": result.get("content", ""), "title": result.get("title", "")}
+            for result in response.json().get("results", [])
+            if result.get("url")
+        ]
+
+    async def search(self, query, max_results=7) -> List[Dict]:
+        """
+        Searches one query, from the cache when possible. Identical queries in flight share one request.
+        Returns:
+            list: dicts with 'href', 'body' (the snippet) and 'title'
+        """
+        self._http()
+        key = (normalize_query(query), self.engines)
+        results = self._cache_get(key)
+        if results is not None:
+            self.counters["hits"] += 1
+            return results[:max_results]
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            results = await asyncio.shield(pending)
+            if results is not None:
+                self.counters["hits"] += 1
+                return results[:max_results]
+            # The request we were waiting on was cancelled, make our own
+            return await self.search(query, max_results)
+
+        self.counters["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        results = None
+        try:
+            results = await self._fetch(query)
+            self._cache_put(key, results)
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"{Fore.RED}Error searching '{query}': {e}{Style.RESET_ALL}")
+            results = []
+        finally:
+            self._pending.pop(key, None)
+            future.set_result(results)
+        return results[:max_results]
+
+    async def search_many(self, queries, max_results=7) -> List[List[Dict]]:
+        """Searches several queries concurrently, results come back in query order."""
+        return list(await asyncio.gather(*(self.search(query, max_results) for query in queries)))
+
+    def stats(self) -> Dict:
+        return dict(self.counters, entries=len(self._cache))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_searx_client: Optional[SearxClient] = None
+
+
+def get_searx_client(cfg=None) -> SearxClient:
+    """
+    Gets the process-wide SearxNG client, creating it on first use
+    """
+    global _searx_client
+    if _searx_client is None:
+        if cfg is None:
+            from backend.config import Config
+            cfg = Config()
+        _searx_client = SearxClient(
+            os.environ["SEARX_URL"],
+            engines=cfg.searx_engines,
+            concurrency=cfg.searx_concurrency,
+            ttl=cfg.searx_cache_ttl,
+            timeout=cfg.searx_timeout,
+        )
+    return _searx_client
+
+
+async def close_searx_client():
+    """Closes the SearxNG client's pooled connections, if it was created."""
+    global _searx_client
+    if _searx_client is not None:
+        await _searx_client.aclose()
+        _searx_client = None
 
 
 class SearxSearch():
@@ -16,15 +173,19 @@ class SearxSearch():
         """
         self.query = query
 
-
-    def search(self, max_results=7):
+    async def search(self, max_results=7):
         """
         Searches the query
         Returns:
+            list: dicts with 'href', 'body' and 'title'
+        """
+        return await get_searx_client().search(self.query, max_results)
 
+    @staticmethod
+    async def search_many(queries, max_results=7):
         """
-        searx = SearxSearchWrapper(searx_host=os.environ["SEARX_URL"])
-        results = searx.results(self.query, max_results)
-        # Normalizing results to match the format of the other search APIs
-        search_response = [{"href": obj["link"], "body": obj["snippet"]} for obj in results]
-        return search_response
+        Searches several queries concurrently
+        Returns:
+            list: one result list per query, in query order
+        """
+        return await get_searx_client().search_many(queries, max_results)
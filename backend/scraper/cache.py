@@ -0,0 +1,188 @@
+import hashlib
+import os
+import threading
+import time
+import zlib
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Optional
+from urllib.parse import urlsplit
+
+from backend.utils.sqlite import SQLiteStore
+from backend.utils.urls import normalize_url
+
+NEWS_HOST_HINTS = ("news", "cnn.", "bbc.", "reuters.", "apnews.", "nytimes.", "theguardian.", "bloomberg.", "cnbc.")
+
+
+@dataclass
+class CachedPage:
+    url: str
+    raw_content: str
+    content_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def is_fresh(self):
+        return time.time() < self.expires_at
+
+
+class PageCache(SQLiteStore):
+    """
+    Disk-backed, content-addressed cache of extracted page text.
+    Pages are keyed by normalized url and point at a content hash, so identical content
+    fetched from different urls is stored once. The store is SQLite, which makes it safe
+    to share between sessions and worker processes.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS contents ("
+        "hash TEXT PRIMARY KEY, raw_content BLOB NOT NULL, size INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS pages ("
+        "url_key TEXT PRIMARY KEY, url TEXT NOT NULL, content_hash TEXT NOT NULL, "
+        "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, "
+        "expires_at REAL NOT NULL, last_access REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)",
+        "CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+    )
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, ttl_document=30 * 86400, ttl_news=3600, ttl_default=86400):
+        self.max_bytes = max_bytes
+        self.ttl_document = ttl_document
+        self.ttl_news = ttl_news
+        self.ttl_default = ttl_default
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        super().__init__(path)
+
+    def ttl_for(self, url):
+        """Documents (pdf/arxiv) change rarely, news changes often."""
+        parts = urlsplit(url)
+        host = parts.netloc.lower()
+        if parts.path.lower().endswith(".pdf") or "arxiv.org" in host:
+            return self.ttl_document
+        if any(hint in host for hint in NEWS_HOST_HINTS) or "/news/" in parts.path.lower():
+            return self.ttl_news
+        return self.ttl_default
+
+    def _count(self, conn, name, amount=1):
+        self.counters[name] += amount
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def get(self, url) -> Optional[CachedPage]:
+        """
+        Looks up a page, fresh or stale. Stale pages are returned so callers can revalidate them.
+        """
+        key = normalize_url(url)
+        with self._lock, closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT p.url, c.raw_content, p.content_hash, p.etag, p.last_modified, p.expires_at "
+                "FROM pages p JOIN contents c ON c.hash = p.content_hash WHERE p.url_key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self._count(conn, "misses")
+                return None
+            conn.execute("UPDATE pages SET last_access = ? WHERE url_key = ?", (time.time(), key))
+            page = CachedPage(row[0], zlib.decompress(row[1]).decode("utf-8"), row[2], row[3], row[4], row[5])
+            self._count(conn, "hits" if page.is_fresh else "stale")
+            return page
+
+    @staticmethod
+    def content_hash(raw_content) -> str:
+        return hashlib.sha256(raw_content.encode("utf-8")).hexdigest()
+
+    def get_content(self, content_hash) -> Optional[str]:
+        """Text stored under a content hash, or None once it was evicted."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT raw_content FROM contents WHERE hash = ?", (content_hash,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def put(self, url, raw_content, etag=None, last_modified=None):
+        key = normalize_url(url)
+        data = raw_content.encode("utf-8")
+        content_hash = self.content_hash(raw_content)
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO contents (hash, raw_content, size) VALUES (?, ?, ?)",
+                (content_hash, zlib.compress(data), len(data)),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url_key, url, content_hash, etag, last_modified, fetched_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, content_hash, etag, last_modified, now, now + self.ttl_for(url), now),
+            )
+            self._count(conn, "stores")
+            self._evict(conn)
+
+    def revalidated(self, url):
+        """Extends the ttl of a page whose origin answered 304 Not Modified."""
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE pages SET fetched_at = ?, expires_at = ?, last_access = ? WHERE url_key = ?",
+                (now, now + self.ttl_for(url), now, normalize_url(url)),
+            )
+            self._count(conn, "revalidated")
+
+    def _evict(self, conn):
+        """Drops least recently used pages until the stored content fits in max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        rows = conn.execute("SELECT url_key, content_hash FROM pages ORDER BY last_access ASC").fetchall()
+        for url_key, content_hash in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM pages WHERE url_key = ?", (url_key,))
+            evicted += 1
+            still_used = conn.execute("SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+            if not still_used:
+                size = conn.execute("SELECT size FROM contents WHERE hash = ?", (content_hash,)).fetchone()
+                conn.execute("DELETE FROM contents WHERE hash = ?", (content_hash,))
+                total -= size[0] if size else 0
+        if evicted:
+            self._count(conn, "evictions", evicted)
+
+    def stats(self):
+        """
+        Returns:
+            dict: counters for this process and totals shared by every process using the store
+        """
+        with closing(self._connect()) as conn:
+            shared = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            pages, size = conn.execute(
+                "SELECT (SELECT COUNT(*) FROM pages), (SELECT COALESCE(SUM(size), 0) FROM contents)"
+            ).fetchone()
+        return {"process": dict(self.counters), "shared": shared, "pages": pages, "bytes": size}
+
+
+_page_cache: Optional[PageCache] = None
+
+
+def get_page_cache(cfg=None) -> Optional[PageCache]:
+    """
+    Gets the process-wide page cache, or None when caching is disabled
+    """
+    global _page_cache
+    if cfg is not None and not cfg.page_cache:
+        return None
+    if _page_cache is None:
+        if cfg is None:
+            _page_cache = PageCache(os.getenv("PAGE_CACHE_PATH", "cache/pages.sqlite"))
+        else:
+            _page_cache = PageCache(
+                cfg.page_cache_path,
+                max_bytes=cfg.page_cache_max_bytes,
+                ttl_document=cfg.page_cache_ttl_document,
+                ttl_news=cfg.page_cache_ttl_news,
+                ttl_default=cfg.page_cache_ttl_default,
+            )
+    return _page_cache
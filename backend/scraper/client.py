@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import importlib.util
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0"
+)
+
+# When the current task's latest fetch got its slot, so latencies can leave out the wait in the queue
+fetch_started: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("fetch_started", default=None)
+
+
+class FetchLimiter:
+    """
+    Caps the number of in-flight fetches, both globally and per host
+    """
+    def __init__(self, max_in_flight=20, per_host=4):
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self._global = asyncio.Semaphore(max_in_flight)
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url):
+        host = urlsplit(url).netloc.lower()
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host)
+            self._hosts[host] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, url):
+        """Hold one per-host slot and one global slot for the duration of a fetch."""
+        async with self._host_semaphore(url):
+            async with self._global:
+                fetch_started.set(time.monotonic())
+                yield
+
+
+class SharedHttpClient:
+    """
+    Long-lived async HTTP client shared by every scrape in the process.
+    Keeps a pooled (HTTP/2 when available) connection set alive between scrapes.
+    """
+    def __init__(
+        self,
+        user_agent=DEFAULT_USER_AGENT,
+        max_connections=100,
+        max_keepalive_connections=20,
+        keepalive_expiry=30.0,
+        max_in_flight=20,
+        per_host=4,
+        http2=True,
+    ):
+        self.loop = asyncio.get_running_loop()
+        self.limiter = FetchLimiter(max_in_flight=max_in_flight, per_host=per_host)
+        self.client = httpx.AsyncClient(
+            http2=http2 and importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            headers={"User-Agent": user_agent},
+            follow_redirects=True,
+        )
+
+    @property
+    def is_usable(self):
+        return not self.client.is_closed and self.loop is asyncio.get_running_loop()
+
+    def slot(self, url):
+        """Reserve a fetch slot for work that does not go through this client (e.g. thread-offloaded loaders)."""
+        return self.limiter.slot(url)
+
+    async def get(self, url, **kwargs) -> httpx.Response:
+        async with self.limiter.slot(url):
+            return await self.client.get(url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, url, **kwargs):
+        """Streams a GET response body while holding a fetch slot, for downloads too large to buffer."""
+        async with self.limiter.slot(url):
+            async with self.client.stream("GET", url, **kwargs) as response:
+                yield response
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_shared_client: Optional[SharedHttpClient] = None
+
+
+def get_http_client(cfg=None) -> SharedHttpClient:
+    """
+    Gets the process-wide scraper client, creating it on first use
+    Args:
+        cfg: Config (optional)
+
+    Returns:
+        SharedHttpClient
+    """
+    global _shared_client
+    if _shared_client is None or not _shared_client.is_usable:
+        if cfg is None:
+            _shared_client = SharedHttpClient()
+        else:
+            _shared_client = SharedHttpClient(
+                user_agent=cfg.user_agent,
+                max_connections=cfg.scraper_max_connections,
+                max_keepalive_connections=cfg.scraper_max_keepalive,
+                max_in_flight=cfg.scraper_max_in_flight,
+                per_host=cfg.scraper_per_host_limit,
+                http2=cfg.scraper_http2,
+            )
+    return _shared_client
+
+
+async def close_http_client():
+    """Closes the process-wide scraper client, if one was created."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
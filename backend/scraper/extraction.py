@@ -0,0 +1,171 @@
+import re
+from collections import defaultdict
+from typing import Callable
+
+# Tags whose text is extracted, the same ones the BeautifulSoup path always read
+TEXT_TAGS = ("p", "h1", "h2", "h3", "h4", "h5")
+BOILERPLATE_TAGS = ("script", "style", "noscript", "template", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button")
+CONTENT_TAGS = ("html", "body", "main", "article")
+
+SCRIPT_TAGS = ("script", "style", "noscript", "template")
+
+# A class or id token naming one of these marks boilerplate ("sidebar", "comments", but not "with-sidebar")
+_boilerplate_token = re.compile(
+    r"comments?|sidebar|menu|navbar|footer|cookies?|consent|banner|share|social|promo|related|adverts?|subscribe|newsletter|breadcrumbs?|popup|modal",
+    re.IGNORECASE,
+)
+_spaces = re.compile(r"\s+")
+
+
+def extract_with_bs(html, encoding=None, max_bytes=None) -> str:
+    """
+    BeautifulSoup extraction: the text of every paragraph and heading, one per line
+    """
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html[:max_bytes] if max_bytes else html, "lxml", from_encoding=encoding)
+
+    for script_or_style in soup(["script", "style"]):
+        script_or_style.extract()
+
+    raw_content = "\n".join(element.text for element in soup.find_all(TEXT_TAGS))
+    lines = (line.strip() for line in raw_content.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)
+
+
+def _parse_html(html, encoding):
+    from lxml import etree
+    from lxml import html as lxml_html
+
+    parser = lxml_html.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+    try:
+        return lxml_html.document_fromstring(html, parser=parser)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _is_boilerplate(element, page_chars) -> bool:
+    """Whole class/id tokens only, and never a container of the article or of most of the page text."""
+    tokens = f"{element.get('class', '')} {element.get('id', '')}".split()
+    if not any(_boilerplate_token.fullmatch(token) for token in tokens):
+        return False
+    if element.find(".//article") is not None or element.find(".//main") is not None:
+        return False
+    return len(element.text_content()) <= page_chars / 2
+
+
+def _prune(root):
+    from lxml import etree
+
+    etree.strip_elements(root, *BOILERPLATE_TAGS, with_tail=False)
+    page_chars = len(root.text_content())
+    for element in root.xpath("//*[@class or @id]"):
+        if element.tag in CONTENT_TAGS or element.getparent() is None:
+            continue
+        if _is_boilerplate(element, page_chars):
+            element.drop_tree()
+
+
+def _main_text(root, min_chars) -> str:
+    blocks = []
+    for element in root.iter(*TEXT_TAGS):
+        text = _spaces.sub(" ", element.text_content()).strip()
+        if not text:
+            continue
+        # Paragraphs that are mostly links are menus and link lists, not content
+        link_chars = sum(len(link.text_content()) for link in element.iter("a"))
+        if link_chars > len(text) / 2:
+            continue
+        blocks.append((element, text))
+
+    # Every block adds its text length to its parent, and half of it to its grandparent
+    scores = defaultdict(float)
+    for element, text in blocks:
+        parent = element.getparent()
+        if parent is not None:
+            scores[parent] += len(text)
+            if parent.getparent() is not None:
+                scores[parent.getparent()] += len(text) / 2
+    if not scores:
+        return ""
+
+    best = max(scores.values())
+    selected = {element for element, score in scores.items() if score >= best / 5}
+
+    def in_content(element):
+        parent = element.getparent()
+        return element.tag == "h1" or parent in selected or (parent is not None and parent.getparent() in selected)
+
+    texts = [text for element, text in blocks if in_content(element)]
+    if sum(len(text) for text in texts) < min_chars:
+        texts = [text for _, text in blocks]
+    return "\n".join(texts)
+
+
+def extract_with_lxml(html, encoding=None, max_bytes=None, min_chars=250) -> str:
+    """
+    Fast path on the lxml tree: boilerplate removal, then text-density scoring to keep the main content
+    Args:
+        html: page bytes (or str)
+        encoding: charset from the response headers, if any
+        max_bytes: input is truncated to this many bytes before parsing
+        min_chars: below this much selected text, every paragraph and heading of the page is kept,
+            and below this much text after boilerplate removal, the page is extracted again without it
+
+    Returns:
+        str: one paragraph or heading per line
+    """
+    from lxml import etree
+
+    if isinstance(html, str):
+        html, encoding = html.encode("utf-8"), "utf-8"
+    if max_bytes:
+        html = html[:max_bytes]
+    root = _parse_html(html, encoding)
+    if root is None:
+        return ""
+    _prune(root)
+    text = _main_text(root, min_chars)
+    if len(text) >= min_chars:
+        return text
+
+    # The pruning may have taken the content with it, retry with only scripts and styles removed
+    root = _parse_html(html, encoding)
+    etree.strip_elements(root, *SCRIPT_TAGS, with_tail=False)
+    unpruned = _main_text(root, min_chars)
+    return unpruned if len(unpruned) > len(text) else text
+
+
+def extract_with_newspaper(html, encoding=None, max_bytes=None) -> str:
+    """
+    newspaper3k extraction on an already downloaded page
+    Returns:
+        str: "title : text", or an empty string when either is missing
+    """
+    from newspaper import Article
+
+    if isinstance(html, bytes):
+        html = html[:max_bytes] if max_bytes else html
+        html = html.decode(encoding or "utf-8", errors="replace")
+    article = Article("https://example.com/", language="en", memoize_articles=False, fetch_images=False)
+    article.download(input_html=html)
+    article.parse()
+    if not (article.title and article.text):
+        return ""
+    return f"{article.title} : {article.text}"
+
+
+def get_html_extractor(name="lxml") -> Callable:
+    """
+    Gets an HTML extraction engine: a function of (html, encoding, max_bytes) returning the page text
+    """
+    match name:
+        case "lxml":
+            return extract_with_lxml
+        case "bs":
+            return extract_with_bs
+        case "newspaper":
+            return extract_with_newspaper
+        case _:
+            raise Exception("HTML extractor not found.")
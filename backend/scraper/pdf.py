@@ -0,0 +1,170 @@
+import asyncio
+import os
+import re
+import tempfile
+from typing import List, Optional, Tuple
+
+from backend.master.url_planner import terms
+from backend.utils.cpu_pool import CpuPool, get_cpu_pool
+from backend.utils.pages import PAGE_SEPARATOR
+
+# Downloaded bytes are buffered up to this size, then written to the temp file from a worker thread
+WRITE_BUFFER_BYTES = 1024 * 1024
+# A page counts towards the text budget when it mentions at least this share of the query terms
+RELEVANT_TERM_SHARE = 0.3
+
+_hyphenated_break = re.compile(r"(\w)-\n(\w)")
+_page_number_line = re.compile(r"^\s*(page\s+)?\d+(\s*(/|of)\s*\d+)?\s*$", re.IGNORECASE)
+_spaces = re.compile(r"[ \t]+")
+
+
+class PdfTooLarge(Exception):
+    """Raised when a PDF is bigger than the download cap."""
+
+
+def clean_page_text(text: str) -> str:
+    """Joins words hyphenated across lines, drops page number lines and collapses whitespace."""
+    text = _hyphenated_break.sub(r"\1\2", text.replace(PAGE_SEPARATOR, " "))
+    lines = (_spaces.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not _page_number_line.match(line))
+
+
+def is_relevant(text, query_terms) -> bool:
+    """Whether a page mentions enough of the query terms. Every page is relevant without a query."""
+    if not query_terms:
+        return True
+    found = len(query_terms & terms(text))
+    return found >= max(1, round(len(query_terms) * RELEVANT_TERM_SHARE))
+
+
+def extract_page_range(path, start, end, query_terms=frozenset()) -> Tuple[int, List[str], List[bool]]:
+    """
+    Runs in a pool process: extracts pages [start, end) of the PDF at `path`, and scores them against the query
+    MuPDF reads the file lazily, so each process only touches the pages it extracts.
+    Returns:
+        tuple: the document's page count, the cleaned text of each page in the range, and whether each is relevant
+    """
+    import fitz
+
+    with fitz.open(path) as doc:
+        pages = [clean_page_text(doc[i].get_text("text")) for i in range(start, min(end, doc.page_count))]
+        return doc.page_count, pages, [is_relevant(page, query_terms) for page in pages]
+
+
+class PdfExtractor:
+    """
+    Streams a PDF into a size-capped temp file and extracts its text page by page in the CPU pool.
+    Extraction stops after `max_pages` pages, or once `max_chars` of relevant text has been collected: pages
+    that mention enough of the query terms count towards the budget, the others are kept but do not count.
+    At most `workers` page batches of one PDF are in flight at a time.
+    """
+    def __init__(self, max_bytes=50 * 1024 * 1024, max_pages=60, max_chars=200000, pages_per_task=8, workers=2, pool=None):
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.pages_per_task = pages_per_task
+        self.workers = workers
+        self.pool: CpuPool = pool or get_cpu_pool()
+
+    async def download(self, http, url, headers=None, timeout=30) -> str:
+        """
+        Downloads a PDF to a temp file, aborting as soon as it goes over the size cap
+        Returns:
+            str: path of the temp file, to be deleted by the caller
+        """
+        async with http.stream(url, headers=headers, timeout=timeout) as response:
+            response.raise_for_status()
+            declared = int(response.headers.get("content-length") or 0)
+            if declared > self.max_bytes:
+                raise PdfTooLarge(f"{url} is {declared} bytes")
+            fd, path = tempfile.mkstemp(suffix=".pdf")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    size = 0
+                    buffer = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > self.max_bytes:
+                            raise PdfTooLarge(f"{url} is over {self.max_bytes} bytes")
+                        buffer += chunk
+                        if len(buffer) >= WRITE_BUFFER_BYTES:
+                            await asyncio.to_thread(file.write, bytes(buffer))
+                            buffer.clear()
+                    if buffer:
+                        await asyncio.to_thread(file.write, bytes(buffer))
+            except BaseException:
+                os.unlink(path)
+                raise
+        return path
+
+    async def extract_pages(self, path, query=None) -> List[str]:
+        """
+        Extracts pages in batches across the pool, in page order, until the page or relevant text budget runs out
+        Args:
+            path: PDF file
+            query: text the pages are scored against, without it every page counts towards the text budget
+
+        Returns:
+            list: cleaned text per page, starting at page 1
+        """
+        query_terms = frozenset(terms(query)) if query else frozenset()
+        pages: List[str] = []
+        collected = 0
+        page_count = self.max_pages
+        next_start = 0
+        in_flight = []
+
+        def submit():
+            nonlocal next_start
+            end = min(next_start + self.pages_per_task, page_count, self.max_pages)
+            in_flight.append(asyncio.wrap_future(self.pool.submit(extract_page_range, path, next_start, end, query_terms)))
+            next_start = end
+
+        submit()
+        try:
+            while in_flight:
+                page_count, batch, relevant = await in_flight.pop(0)
+                pages.extend(batch)
+                collected += sum(len(page) for page, counts in zip(batch, relevant) if counts)
+                if collected >= self.max_chars:
+                    break
+                while len(in_flight) < self.workers and next_start < min(page_count, self.max_pages):
+                    submit()
+        finally:
+            for future in in_flight:
+                future.cancel()
+        return pages
+
+    async def extract(self, http, url, headers=None, timeout=30, query=None) -> str:
+        """
+        Returns:
+            str: the text of the PDF's pages, joined with PAGE_SEPARATOR
+        """
+        path = await self.download(http, url, headers=headers, timeout=timeout)
+        try:
+            return PAGE_SEPARATOR.join(await self.extract_pages(path, query))
+        finally:
+            os.unlink(path)
+
+
+_pdf_extractor: Optional[PdfExtractor] = None
+
+
+def get_pdf_extractor(cfg=None) -> PdfExtractor:
+    """
+    Gets the process-wide PDF extractor, it shares the process-wide CPU pool
+    """
+    global _pdf_extractor
+    if _pdf_extractor is None:
+        if cfg is None:
+            _pdf_extractor = PdfExtractor()
+        else:
+            _pdf_extractor = PdfExtractor(
+                max_bytes=cfg.pdf_max_bytes,
+                max_pages=cfg.pdf_max_pages,
+                max_chars=cfg.pdf_max_chars,
+                pages_per_task=cfg.pdf_pages_per_task,
+                workers=cfg.pdf_workers,
+                pool=get_cpu_pool(cfg),
+            )
+    return _pdf_extractor
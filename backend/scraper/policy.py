@@ -0,0 +1,189 @@
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# Pages with less text than this are treated as empty (paywalls, consent walls, JS-only pages)
+MIN_CONTENT_CHARS = 100
+
+
+class DomainStats:
+    """Recent fetch outcomes of one domain, and the state of its circuit breaker."""
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.failures = {"error": 0, "timeout": 0, "empty": 0}
+        self.opened_until = 0.0
+        # Token of the half-open probe in flight, only the fetch holding it can end it
+        self.probing: Optional[object] = None
+
+    def percentile(self, q) -> Optional[float]:
+        return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+    @property
+    def failure_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+
+class FetchPolicy:
+    """
+    Per-domain fetch policy shared by every scrape in the process.
+    Timeouts follow each domain's observed latency, domains that keep failing (errors, timeouts or
+    empty content) get their circuit opened for a cooldown, and slow hosts go last when there are
+    more urls than needed.
+    """
+    def __init__(
+        self,
+        default_timeout=6.0,
+        min_timeout=2.0,
+        max_timeout=15.0,
+        timeout_multiplier=2.0,
+        failure_threshold=3,
+        failure_rate=0.6,
+        min_samples=5,
+        cooldown=600.0,
+        window=50,
+    ):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.window = window
+        self.domains: Dict[str, DomainStats] = {}
+
+    @staticmethod
+    def domain(url) -> str:
+        host = urlsplit(url).hostname or ""
+        return host[4:] if host.startswith("www.") else host
+
+    def _stats(self, url) -> DomainStats:
+        domain = self.domain(url)
+        stats = self.domains.get(domain)
+        if stats is None:
+            stats = self.domains[domain] = DomainStats(self.window)
+        return stats
+
+    def timeout(self, url) -> float:
+        """A multiple of the domain's p90 latency once there are enough samples, within [min, max]."""
+        stats = self.domains.get(self.domain(url))
+        if stats is None or len(stats.latencies) < self.min_samples:
+            return self.default_timeout
+        timeout = stats.percentile(90) * self.timeout_multiplier
+        return min(self.max_timeout, max(self.min_timeout, timeout))
+
+    def allow(self, url) -> Tuple[bool, Optional[object]]:
+        """
+        Whether a fetch may go ahead. Once an open circuit's cooldown has passed, a single probe is let
+        through (half-open), and its outcome closes or re-opens the circuit.
+        Returns:
+            tuple: whether the fetch may go ahead, and the probe token when it is the probe (to pass to end_probe)
+        """
+        stats = self.domains.get(self.domain(url))
+        if stats is None or not stats.opened_until:
+            return True, None
+        if time.time() < stats.opened_until or stats.probing:
+            return False, None
+        stats.probing = object()
+        return True, stats.probing
+
+    def is_open(self, url) -> bool:
+        stats = self.domains.get(self.domain(url))
+        return bool(stats and stats.opened_until and (time.time() < stats.opened_until or stats.probing))
+
+    def record_success(self, url, latency):
+        stats = self._stats(url)
+        stats.latencies.append(latency)
+        stats.outcomes.append(True)
+        stats.consecutive_failures = 0
+        stats.opened_until = 0.0
+        stats.probing = None
+
+    def record_failure(self, url, kind="error", latency=None):
+        """
+        Args:
+            kind: 'error', 'timeout' or 'empty'
+            latency: seconds spent, recorded unless the fetch timed out
+        """
+        stats = self._stats(url)
+        if latency is not None and kind != "timeout":
+            stats.latencies.append(latency)
+        elif kind == "timeout":
+            # A timeout says the domain is at least this slow
+            stats.latencies.append(self.timeout(url))
+        stats.outcomes.append(False)
+        stats.failures[kind] += 1
+        stats.consecutive_failures += 1
+        tripped = stats.consecutive_failures >= self.failure_threshold or (
+            len(stats.outcomes) >= self.min_samples and stats.failure_rate >= self.failure_rate
+        )
+        if stats.probing or tripped:
+            stats.opened_until = time.time() + self.cooldown
+            stats.probing = None
+
+    def end_probe(self, url, token):
+        """
+        Releases the half-open probe started with `token` if it recorded no outcome, the next fetch after the
+        cooldown probes again. A probe started since by another fetch is left alone.
+        """
+        stats = self.domains.get(self.domain(url))
+        if stats is not None and token is not None and stats.probing is token:
+            stats.probing = None
+
+    def rank(self, urls, needed=0) -> List[str]:
+        """
+        Drops urls whose domain has an open circuit, and when more urls remain than `needed`,
+        keeps the `needed` ones expected to be fastest (unknown domains keep their search order).
+        """
+        urls = [url for url in urls if not self.is_open(url)]
+        if not needed or len(urls) <= needed:
+            return urls
+
+        def expected_latency(url):
+            stats = self.domains.get(self.domain(url))
+            median = stats.percentile(50) if stats else None
+            penalty = stats.failure_rate * self.max_timeout if stats else 0.0
+            return (median if median is not None else self.default_timeout / 2) + penalty
+
+        return sorted(urls, key=expected_latency)[:needed]
+
+    def stats(self) -> Dict:
+        return {
+            domain: {
+                "p50": stats.percentile(50),
+                "p90": stats.percentile(90),
+                "timeout": self.timeout(f"http://{domain}/"),
+                "failure_rate": stats.failure_rate,
+                "failures": stats.failures,
+                "open": bool(stats.opened_until and time.time() < stats.opened_until),
+            }
+            for domain, stats in self.domains.items()
+        }
+
+
+_fetch_policy: Optional[FetchPolicy] = None
+
+
+def get_fetch_policy(cfg=None) -> FetchPolicy:
+    """
+    Gets the process-wide fetch policy, creating it on first use
+    """
+    global _fetch_policy
+    if _fetch_policy is None:
+        if cfg is None:
+            _fetch_policy = FetchPolicy()
+        else:
+            _fetch_policy = FetchPolicy(
+                default_timeout=cfg.scraper_default_timeout,
+                min_timeout=cfg.scraper_min_timeout,
+                max_timeout=cfg.scraper_max_timeout,
+                failure_threshold=cfg.scraper_breaker_failures,
+                cooldown=cfg.scraper_breaker_cooldown,
+            )
+    return _fetch_policy
@@ -1,62 +1,136 @@
-from concurrent.futures.thread import ThreadPoolExecutor
-from langchain.document_loaders import PyMuPDFLoader
+import asyncio
+import time
+
+import httpx
 from langchain.retrievers import ArxivRetriever
 from youtube_transcript_api import YouTubeTranscriptApi
-from functools import partial
-import requests
-from bs4 import BeautifulSoup
-from newspaper import Article
+
+from backend.utils.cpu_pool import get_cpu_pool
+from backend.utils.tracing import annotate, get_tracer
+
+from .cache import get_page_cache
+from .client import fetch_started, get_http_client
+from .extraction import extract_with_newspaper, get_html_extractor
+from .pdf import get_pdf_extractor
+from .policy import MIN_CONTENT_CHARS, get_fetch_policy
 
 class Scraper:
     """
     Scraper class to extract the content from the links
     """
-    def __init__(self, urls, user_agent, scraper):
+    def __init__(self, urls, user_agent, scraper, cfg=None, query=None):
         """
         Initialize the Scraper class.
         Args:
             urls:
+            user_agent:
+            scraper: "bs" or "newspaper"
+            cfg: Config (optional), used to size the shared HTTP client and page cache
+            query: research query (optional), PDF extraction stops once enough text relevant to it is collected
         """
         self.urls = urls
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": user_agent
-        })
+        self.query = query
+        self.headers = {"User-Agent": user_agent}
         self.scraper = scraper
-
-    def run(self):
+        self.http = get_http_client(cfg)
+        self.cache = get_page_cache(cfg)
+        self.pdf = get_pdf_extractor(cfg)
+        # HTML parsing is CPU-bound, it runs in the process pool rather than in GIL-bound threads
+        self.cpu = get_cpu_pool(cfg)
+        self.extract_html = get_html_extractor(cfg.html_extractor if cfg else "lxml")
+        self.html_max_bytes = cfg.html_max_bytes if cfg else 2 * 1024 * 1024
+        self.policy = get_fetch_policy(cfg)
+        self.tracer = get_tracer(cfg)
+        # ETag / Last-Modified of pages fetched in this run, stored alongside the cached content
+        self.validators = {}
+
+    async def run(self):
         """
-        Extracts the content from the links
+        Extracts the content from the links concurrently.
+        Concurrency is bounded by the shared client's global and per-host limits.
         """
-        partial_extract = partial(self.extract_data_from_link, session=self.session)
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            contents = executor.map(partial_extract, self.urls)
+        contents = await asyncio.gather(*(self.extract_data_from_link(url) for url in self.urls))
         res = [content for content in contents if content['raw_content'] is not None]
         return res
 
-    def extract_data_from_link(self, link, session):
+    async def extract_data_from_link(self, link):
         """
-        Extracts the data from the link
+        Extracts the data from the link, timed as one scrape span
         """
+        with self.tracer.span("scrape", url=link) as span:
+            result = await self._extract_data_from_link(link)
+            span.set(chars=len(result['raw_content'] or ""))
+            return result
+
+    async def _extract_data_from_link(self, link):
+        cached = await asyncio.to_thread(self.cache.get, link) if self.cache else None
+        if cached is not None and cached.is_fresh:
+            annotate(outcome="cached")
+            return {'url': link, 'raw_content': cached.raw_content}
+
+        # Domains that keep failing are skipped until their circuit breaker cools down
+        allowed, probe = self.policy.allow(link)
+        if not allowed:
+            annotate(outcome="circuit_open")
+            return {'url': link, 'raw_content': None}
+
         content = ""
+        timeout = self.policy.timeout(link)
+        start = time.monotonic()
         try:
             if link.endswith(".pdf"):
-                content = self.scrape_pdf_with_pymupdf(link)
+                content = await self.pdf.extract(self.http, link, headers=self.headers, timeout=timeout, query=self.query)
             elif "arxiv.org" in link:
                 doc_num = link.split("/")[-1]
-                content = self.scrape_pdf_with_arxiv(doc_num)
+                content = await self._run_blocking(link, self.scrape_pdf_with_arxiv, doc_num)
             elif "youtube" in link:
-                content = self.scrape_youtube_transcripts(link)
+                content = await self._run_blocking(link, self.scrape_youtube_transcripts, link)
             elif link and self.scraper=="bs":
-                content = self.scrape_text_with_bs(link, session)
+                content = await self.scrape_text_with_bs(link, cached, timeout)
             else:
-                content = self.scrape_url_with_newspaper(link)
+                content = await self.scrape_url_with_newspaper(link, cached, timeout)
 
-            if len(content) < 100:
+            if len(content) < MIN_CONTENT_CHARS:
+                self.policy.record_failure(link, "empty", self.elapsed(start))
+                annotate(outcome="empty")
                 return {'url': link, 'raw_content': None}
+            self.policy.record_success(link, self.elapsed(start))
+            annotate(outcome="fetched")
+            if self.cache:
+                await self.store(link, content, cached)
             return {'url': link, 'raw_content': content}
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            self.policy.record_failure(link, "timeout")
+            annotate(outcome="timeout")
+            return {'url': link, 'raw_content': None}
         except Exception as e:
+            self.policy.record_failure(link, "error", self.elapsed(start))
+            annotate(outcome="error", error=type(e).__name__)
             return {'url': link, 'raw_content': None}
+        finally:
+            # A probe that ends without an outcome (cancelled) must not keep its domain blocked
+            self.policy.end_probe(link, probe)
+
+    @staticmethod
+    def elapsed(start):
+        """Seconds since the fetch got its slot (or since `start`), without the wait for the slot."""
+        acquired = fetch_started.get()
+        return time.monotonic() - (acquired if acquired is not None and acquired > start else start)
+
+    async def store(self, link, content, cached):
+        """Caches new content. An unchanged stale entry (304, or a 200 with the same content) just gets its ttl extended."""
+        validators = self.validators.get(link)
+        unchanged = cached is not None and content == cached.raw_content
+        if unchanged and (validators is None or validators == (cached.etag, cached.last_modified)):
+            await asyncio.to_thread(self.cache.revalidated, link)
+        else:
+            etag, last_modified = validators or (None, None)
+            await asyncio.to_thread(self.cache.put, link, content, etag, last_modified)
+
+    async def _run_blocking(self, link, func, *args):
+        """Runs a blocking loader in a worker thread while holding a fetch slot for its host."""
+        async with self.http.slot(link):
+            return await asyncio.to_thread(func, *args)
 
     def scrape_youtube_transcripts(self, url: str) -> str:
         """Scrape transcript from a Youtube video url
@@ -79,56 +153,28 @@ class Scraper:
 
         return output
 
-    def scrape_text_with_bs(self, link, session):
-        response = session.get(link, timeout=4)
-        soup = BeautifulSoup(response.content, 'lxml', from_encoding=response.encoding)
-
-        for script_or_style in soup(["script", "style"]):
-            script_or_style.extract()
-
-        raw_content = self.get_content_from_url(soup)
-        lines = (line.strip() for line in raw_content.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        content = "\n".join(chunk for chunk in chunks if chunk)
-        return content
-
-    def scrape_url_with_newspaper(self, url) -> str:
-        try:
-            # Uses newspaper3k to extract webpage content 
-            article = Article(
-                url,
-                language="en",
-                memoize_articles=False,
-                fetch_images=False
-            )
-            article.download()
-            article.parse()
-
-            # Extracting the title and text if present from the parsed article
-            title = article.title
-            text = article.text
-
-            # If title, summary are not present then return blank string
-            if not (title and text):
-                return ""
-
-            return f"{title} : {text}"
-        
-        except Exception as e:
-            return ""
-
-    def scrape_pdf_with_pymupdf(self, url) -> str:
-        """Scrape a pdf with pymupdf
-
-        Args:
-            url (str): The url of the pdf to scrape
-
-        Returns:
-            str: The text scraped from the pdf
-        """
-        loader = PyMuPDFLoader(url)
-        doc = loader.load()
-        return str(doc)
+    async def scrape_text_with_bs(self, link, cached=None, timeout=4, extract=None):
+        headers = dict(self.headers)
+        if cached is not None:
+            # Stale cache entry: ask the origin whether it changed before re-parsing
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        response = await self.http.get(link, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            return cached.raw_content
+        # Error pages (paywalls, rate limits, bot walls) count as failures, not as content
+        response.raise_for_status()
+        self.validators[link] = (response.headers.get("etag"), response.headers.get("last-modified"))
+        # Only a declared charset is passed on, otherwise the parser sniffs the document's own meta tags
+        return await self.cpu.run(
+            extract or self.extract_html, response.content, response.charset_encoding, self.html_max_bytes
+        )
+
+    async def scrape_url_with_newspaper(self, url, cached=None, timeout=7) -> str:
+        """Downloads with the shared client, then lets newspaper3k parse the page in the process pool."""
+        return await self.scrape_text_with_bs(url, cached, timeout, extract=extract_with_newspaper)
 
     def scrape_pdf_with_arxiv(self, query) -> str:
         """Scrape a pdf with arxiv
@@ -143,18 +189,3 @@ class Scraper:
         retriever = ArxivRetriever(load_max_docs=2, doc_content_chars_max=None)
         docs = retriever.get_relevant_documents(query=query)
         return docs[0].page_content
-
-    def get_content_from_url(self, soup):
-        """Get the text from the soup
-
-        Args:
-            soup (BeautifulSoup): The soup to get the text from
-
-        Returns:
-            str: The text from the soup
-        """
-        text = ""
-        tags = ['p', 'h1', 'h2', 'h3', 'h4', 'h5']
-        for element in soup.find_all(tags):  # Find all the <p> elements
-            text += element.text + "\n"
-        return text
\ No newline at end of file
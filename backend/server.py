@@ -1,12 +1,26 @@
 from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, File, UploadFile, Form
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+import asyncio
 import json
 import os
 import aiofiles
 from typing import List
 from backend.utils.websocket_manager import WebSocketManager
+from backend.config import Config
+from backend.jobs import JobRejected, get_job_queue
+from backend.master.checkpoint import get_session_store
+from backend.llm_provider import close_provider_registry, get_llm_scheduler
+from backend.scraper.cache import get_page_cache
+from backend.retriever import close_searx_client, get_searx_client
+from backend.scraper.client import close_http_client
+from backend.scraper.policy import get_fetch_policy
+from backend.utils.cpu_pool import close_cpu_pool, get_cpu_pool
+from backend.utils.llm_cache import get_llm_cache
+from backend.utils.loop_monitor import get_loop_monitor
+from backend.utils.tracing import close_tracer, get_tracer
 from output_gen_utils import write_md_to_pdf
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -40,7 +54,11 @@ app.add_middleware(
 # templates = Jinja2Templates(directory="./frontend")
 # # app.mount("/", StaticFiles(directory="reach-react-app/build", html=True), name="react_app")
 
-manager = WebSocketManager()
+cfg = Config()
+manager = WebSocketManager(
+    queue_size=cfg.ws_queue_size, flush_interval=cfg.ws_flush_interval, log_policy=cfg.ws_log_policy
+)
+job_queue = get_job_queue(cfg)
 
 # Dynamic directory for outputs once first research is run
 @app.on_event("startup")
@@ -49,6 +67,89 @@ def startup_event():
         os.makedirs("outputs")
     app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
 
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("startup")
+async def start_cpu_pool():
+    get_loop_monitor(cfg).start()
+    # Worker processes are spawned and import their parsers before the first request needs them
+    await asyncio.to_thread(get_cpu_pool(cfg).warm)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await job_queue.stop()
+    await close_http_client()
+    close_cpu_pool()
+    await get_loop_monitor().stop()
+    close_tracer()
+    await close_searx_client()
+    await close_provider_registry()
+
+@app.get("/stats/page-cache")
+async def page_cache_stats():
+    page_cache = get_page_cache(Config())
+    return page_cache.stats() if page_cache else {}
+
+@app.get("/stats/fetch-policy")
+async def fetch_policy_stats():
+    return get_fetch_policy(cfg).stats()
+
+@app.get("/stats/search")
+async def search_stats():
+    return get_searx_client(cfg).stats() if cfg.retriever == "searx" else {}
+
+@app.get("/stats/llm-scheduler")
+async def llm_scheduler_stats():
+    return get_llm_scheduler().metrics()
+
+@app.get("/stats/llm-cache")
+async def llm_cache_stats():
+    llm_cache = get_llm_cache(Config())
+    return llm_cache.stats() if llm_cache else {}
+
+@app.get("/stats/websockets")
+async def websocket_stats():
+    return manager.stats()
+
+@app.get("/stats/cpu-pool")
+async def cpu_pool_stats():
+    return get_cpu_pool(cfg).stats()
+
+@app.get("/stats/event-loop")
+async def event_loop_stats():
+    return get_loop_monitor(cfg).stats()
+
+@app.get("/stats/stages")
+async def stage_stats():
+    return get_tracer(cfg).stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    loop = get_loop_monitor(cfg)
+    pool = get_cpu_pool(cfg).stats()
+    extra = [
+        ("webscrape_event_loop_lag_max_seconds", "gauge", "Largest event loop lag since start.", loop.max_lag),
+        ("webscrape_event_loop_lag_last_seconds", "gauge", "Latest event loop lag sample.", loop.samples[-1] if loop.samples else 0),
+        ("webscrape_event_loop_blocked_total", "counter", "Times the loop was blocked past the watchdog threshold.", loop.blocked),
+        ("webscrape_cpu_pool_tasks_total", "counter", "Tasks submitted to the CPU pool.", pool["tasks"]),
+        ("webscrape_cpu_pool_in_flight", "gauge", "CPU pool tasks not finished yet.", pool["in_flight"]),
+    ]
+    return PlainTextResponse(get_tracer(cfg).prometheus(extra), media_type="text/plain; version=0.0.4")
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await job_queue.get(job_id)
+    return job if job else {"error": "Job not found."}
+
+async def send_session_snapshot(websocket, session_id):
+    """Sends the checkpointed table of a session, so a reconnecting client shows it before any new event."""
+    session_store = get_session_store(cfg)
+    if session_store and session_id:
+        for message in await asyncio.to_thread(session_store.snapshot, session_id):
+            manager.send(websocket, message)
+
 # @app.get("/")
 # async def read_root(request: Request):
 #     return templates.TemplateResponse('index.html', {"request": request, "report": None})
@@ -66,19 +167,43 @@ async def websocket_endpoint(websocket: WebSocket):
                 task = json_data.get("task")
                 columns = json_data.get("columnHeaders")
                 rows = json_data.get("rowCount")
+                session_id = json_data.get("sessionId")
+                context_mode = json_data.get("contextMode")
                 print(f"Parsed task: {task}, columns: {columns}, rows: {rows}")
 
                 if task:
-                    report = await manager.start_streaming(task, columns, rows, websocket)
-                    # Ensure the output is sent as a JSON string
-                    await websocket.send_json({"type": "dataset", "output": report})
-                    print(f"report: {report}")
+                    try:
+                        params = {"task": task, "columns": columns, "rows": rows}
+                        if session_id:
+                            # Resumes an interrupted session from its checkpoints
+                            params["session_id"] = session_id
+                        if context_mode in ("full", "snippet_first"):
+                            params["context_mode"] = context_mode
+                        # Capped per client address rather than per socket, so reconnecting does not reset it
+                        job_id = await job_queue.submit(params, client=websocket.client.host if websocket.client else None)
+                    except JobRejected as e:
+                        manager.send(websocket, {"type": "error", "output": str(e)})
+                        continue
+                    # The run lives in the job queue, the socket only follows its events
+                    manager.send(websocket, {"type": "job", "id": job_id})
+                    await send_session_snapshot(websocket, session_id)
+                    await manager.attach_job(websocket, job_queue, job_id)
                 else:
                     print("Error: not enough parameters provided.")
+            elif data.startswith("attach"):
+                job_id = data[7:].strip()
+                job = await job_queue.get(job_id)
+                if job is None:
+                    manager.send(websocket, {"type": "error", "output": f"Job {job_id} not found."})
+                else:
+                    await send_session_snapshot(websocket, job["params"].get("session_id") or job_id)
+                    await manager.attach_job(websocket, job_queue, job_id)
     except WebSocketDisconnect:
-        await manager.disconnect(websocket)
         print("WebSocket disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
+    finally:
+        # Stops the socket's sender and job forwarding tasks whatever ended the connection
+        await manager.disconnect(websocket)
 
 
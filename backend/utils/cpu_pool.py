@@ -0,0 +1,191 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Optional, Union
+
+# Modules every worker imports when it starts, so the first real task does not pay for them
+WARM_IMPORTS = ("backend.scraper.extraction", "backend.context.compression", "fitz")
+
+
+@dataclass(frozen=True)
+class SharedBuffer:
+    """Handle to bytes placed in a shared memory block: only the name and size cross the process boundary."""
+    name: str
+    size: int
+    is_text: bool
+
+
+def _warm_worker(modules):
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def _ping(delay):
+    # Holding each worker briefly makes the warm-up tasks spread over all of them
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _read_shared(buffer: SharedBuffer):
+    block = shared_memory.SharedMemory(name=buffer.name)
+    try:
+        data = bytes(block.buf[:buffer.size])
+    finally:
+        block.close()
+    return data.decode("utf-8") if buffer.is_text else data
+
+
+def _call_with_shared(func, buffer: SharedBuffer, args, kwargs):
+    """Runs in a pool process: reads the shared buffer and calls `func` with it as first argument."""
+    return func(_read_shared(buffer), *args, **kwargs)
+
+
+class CpuPool:
+    """
+    Process pool for the CPU-bound stages (HTML and PDF extraction, chunking), sized to the cores by default.
+    Large inputs are handed over through shared memory instead of being pickled into the task queue.
+
+    Daemon processes (the SQLite job workers) cannot have children, there the pool falls back to threads.
+    """
+    def __init__(self, workers=None, shared_min_bytes=256 * 1024, warm_imports=WARM_IMPORTS):
+        self.workers = workers or os.cpu_count() or 1
+        self.shared_min_bytes = shared_min_bytes
+        self.warm_imports = warm_imports
+        self.counters = {"tasks": 0, "shared_tasks": 0, "shared_bytes": 0, "errors": 0}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.in_process = multiprocessing.current_process().daemon
+        self._pool: Optional[Executor] = None
+
+    @property
+    def pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None and self.in_process:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu-pool")
+            elif self._pool is None:
+                # Spawned, not forked: the parent runs an event loop and threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                    initargs=(self.warm_imports,),
+                )
+            return self._pool
+
+    def warm(self):
+        """Starts every worker process now and waits for them to import their modules."""
+        if self.in_process:
+            _warm_worker(self.warm_imports)
+            return 0
+        futures = [self.pool.submit(_ping, 0.2) for _ in range(self.workers)]
+        return len({future.result() for future in futures})
+
+    def _share(self, data: Union[str, bytes]):
+        """Copies `data` into a new shared memory block, or returns (None, None) when it is small enough to pickle
+        (or the pool runs threads)."""
+        if self.in_process:
+            return None, None
+        is_text = isinstance(data, str)
+        raw = data.encode("utf-8") if is_text else data
+        if len(raw) < self.shared_min_bytes:
+            return None, None
+        block = shared_memory.SharedMemory(create=True, size=max(len(raw), 1))
+        block.buf[:len(raw)] = raw
+        with self._lock:
+            self.counters["shared_tasks"] += 1
+            self.counters["shared_bytes"] += len(raw)
+        return block, SharedBuffer(block.name, len(raw), is_text)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        with self._lock:
+            self.counters["tasks"] += 1
+            self._in_flight += 1
+        future = self.pool.submit(func, *args, **kwargs)
+        future.add_done_callback(self._done)
+        return future
+
+    def submit_data(self, func: Callable, data: Union[str, bytes], *args, **kwargs) -> Future:
+        """
+        Submits func(data, *args, **kwargs), passing large `data` through shared memory.
+        The shared block is released once the task is done.
+        """
+        block, buffer = self._share(data)
+        if block is None:
+            return self.submit(func, data, *args, **kwargs)
+        try:
+            future = self.submit(_call_with_shared, func, buffer, args, kwargs)
+        except BaseException:
+            block.close()
+            block.unlink()
+            raise
+
+        def release(_):
+            block.close()
+            block.unlink()
+
+        future.add_done_callback(release)
+        return future
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled() and future.exception() is not None:
+                self.counters["errors"] += 1
+
+    def call(self, func: Callable, data: Union[str, bytes], *args, **kwargs):
+        """Blocking form of `run`, for code already running in a worker thread."""
+        return self.submit_data(func, data, *args, **kwargs).result()
+
+    async def run(self, func: Callable, data: Union[str, bytes], *args, **kwargs):
+        """
+        Runs func(data, *args, **kwargs) in a pool process without blocking the event loop
+        Returns:
+            the function's result
+        """
+        return await asyncio.wrap_future(self.submit_data(func, data, *args, **kwargs))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(
+                self.counters, workers=self.workers, in_flight=self._in_flight, started=self._pool is not None,
+                threads=self.in_process,
+            )
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_cpu_pool: Optional[CpuPool] = None
+
+
+def get_cpu_pool(cfg=None) -> CpuPool:
+    """
+    Gets the process-wide CPU pool, its worker processes are started on first use (or by `warm`)
+    """
+    global _cpu_pool
+    if _cpu_pool is None:
+        if cfg is None:
+            _cpu_pool = CpuPool()
+        else:
+            _cpu_pool = CpuPool(workers=cfg.cpu_workers, shared_min_bytes=cfg.cpu_shared_min_bytes)
+    return _cpu_pool
+
+
+def close_cpu_pool():
+    """Shuts down the CPU pool, if one was started."""
+    global _cpu_pool
+    if _cpu_pool is not None:
+        _cpu_pool.close()
+        _cpu_pool = None
@@ -5,10 +5,14 @@ import numpy as np
 import pandas as pd
 from colorama import Fore, Style
 
+from backend.llm_provider import Priority
+from backend.master.dataset_summary import DatasetSummary
 from backend.master.prompts import generate_row_prompt, generate_search_queries_prompt, generate_summary_prompt
 from backend.scraper.scraper import Scraper
 
+from backend.utils.json_stream import JSONRowStreamParser
 from backend.utils.llm import create_chat_completion
+from backend.utils.tracing import estimate_text_tokens, get_tracer
 
 
 async def generate_row(
@@ -19,88 +23,68 @@ async def generate_row(
         websocket,
         role_prompt,
         cfg,
+        on_row=None,
     ):
+        """
+        Streams a batch of new rows from the LLM
+        Args:
+            on_row: coroutine called with each row as soon as it has been parsed from the stream
+
+        Returns:
+            list: row dicts restricted to the columns, in the order they were streamed
+        """
         content = (f"{generate_row_prompt(context, columns, existing_data, user_query)}")
+        parser = JSONRowStreamParser(columns)
+        rows = []
+
+        async def emit(new_rows):
+            for row in new_rows:
+                rows.append(row)
+                if on_row is not None:
+                    await on_row(row)
+
+        async def on_chunk(chunk):
+            await emit(parser.feed(chunk))
+
+        with get_tracer(cfg).span("generate_rows", prompt_tokens=estimate_text_tokens(content)) as span:
+            try:
+                await create_chat_completion(
+                    model=cfg.smart_llm_model,
+                    messages=[
+                        {"role": "system", "content": f"{role_prompt}"},
+                        {"role": "user", "content": content}
+                    ],
+                    temperature=0,
+                    llm_provider=cfg.llm_provider,
+                    stream=True,
+                    websocket=websocket,
+                    max_tokens=cfg.smart_token_limit,
+                    priority=Priority.INTERACTIVE,
+                    on_chunk=on_chunk,
+                    # A pass after a stall sends the same prompt again, it must reach the model to get new rows
+                    cache=False
+                )
+            except Exception as e:
+                # Rows that were complete before the failure are still returned
+                print(f"{Fore.RED}Error in generate_report: {e}{Style.RESET_ALL}")
+
+            await emit(parser.finish())
+            span.set(rows=len(rows))
+        return rows
 
-        try:
-            report = await create_chat_completion(
-                model=cfg.smart_llm_model,
-                messages=[
-                    {"role": "system", "content": f"{role_prompt}"},
-                    {"role": "user", "content": content}
-                ],
-                temperature=0,
-                llm_provider=cfg.llm_provider,
-                stream=True,
-                websocket=websocket,
-                max_tokens=cfg.smart_token_limit
-            )
-        except Exception as e:
-            print(f"{Fore.RED}Error in generate_report: {e}{Style.RESET_ALL}")
-
-        return report
-
-async def summarize_dataframe(df, sample_rows=5, sample_columns=20):
+async def summarize_dataframe(df, max_key_values=200):
     """
-    Create a summary of a Pandas DataFrame for ChatGPT.
+    Create a deterministic summary of a Pandas DataFrame for ChatGPT.
 
     Parameters:
         df (Pandas DataFrame): The dataframe to be summarized.
-        sample_rows (int): The number of rows to sample
-        sample_columns (int): The number of columns to sample
+        max_key_values (int): The number of already collected key values to list
 
     Returns:
         A markdown string with a summary of the dataframe
     """
-    num_rows, num_cols = df.shape
-
-    # Column Summary
-    ## Missing value summary for all columns
-    # missing_values = pd.DataFrame(df.isnull().sum(), columns=['Missing Values'])
-    # missing_values['% Missing'] = missing_values['Missing Values'] / num_rows * 100
-
-    ## Data type summary for all columns
-    # column_info = pd.concat([df.dtypes, missing_values], axis=1).reset_index()
-    # column_info.columns = ["Column Name", "Data Type", "Missing Values", "% Missing"]
-    # column_info['Data Type'] = column_info['Data Type'].astype(str)
-
-    # Basic summary statistics for numerical and categorical columns
-    # get basic statistical information for each column
-    # numerical_summary = (
-    #     df.describe(include=[np.number]).T.reset_index().rename(columns={'index': 'Column Name'})
-    # )
-
-    # has_categoricals = any(df.select_dtypes(include=['category', 'datetime', 'timedelta']).columns)
-
-    # if has_categoricals:
-    #     categorical_describe = df.describe(include=['category', 'datetime', 'timedelta'])
-    #     categorical_summary = categorical_describe.T.reset_index().rename(
-    #         columns={'index': 'Column Name'}
-    #     )
-    # else:
-    #     categorical_summary = pd.DataFrame(columns=['Column Name'])
-
-    sample_columns = min(sample_columns, df.shape[1])
-    sample_rows = min(sample_rows, df.shape[0])
-    sampled = df.sample(sample_columns, axis=1).sample(sample_rows, axis=0)
-    columns_df = pd.DataFrame(df.columns, columns=['Column Name'])
-
-    tablefmt = "github"
-
-    # create the markdown string for output
-    output = (
-        f"## Dataframe Summary\n\n"
-        f"Number of Rows: {num_rows:,}\n\n"
-        f"Number of Columns: {num_cols:,}\n\n"
-        # f"### Column Information\n\n{columns_df.to_markdown(tablefmt=tablefmt)}\n\n"
-        f"### Column Information\n\n{columns_df}\n\n"
-        # f"### Numerical Summary\n\n{numerical_summary.to_markdown(tablefmt=tablefmt)}\n\n"
-        # f"### Categorical Summary\n\n{categorical_summary.to_markdown(tablefmt=tablefmt)}\n\n"
-        # f"### Sample Data ({sample_rows}x{sample_columns})\n\n{sampled.to_markdown(tablefmt=tablefmt)}"
-         f"### Sample Data ({sample_rows}x{sample_columns})\n\n{sampled}"
-    )
-
-    return output
+    summary = DatasetSummary(df.columns, max_key_values=max_key_values)
+    return summary.update(df.to_dict('records')).digest()
 
 
 def get_retriever(retriever):
@@ -153,16 +137,16 @@ async def get_sub_queries(query: str, agent_role_prompt: str, cfg, ):
         temperature=0,
         llm_provider=cfg.llm_provider
     )
-    print(f'response: {response}')
     sub_queries = json.loads(response)
     return sub_queries
 
-def scrape_urls(urls, cfg=None):
+async def scrape_urls(urls, cfg=None, query=None):
     """
-    Scrapes the urls
+    Scrapes the urls on the shared async HTTP client
     Args:
         urls: List of urls
         cfg: Config (optional)
+        query: research query (optional), bounds PDF extraction by relevant text
 
     Returns:
         text: str
@@ -171,7 +155,7 @@ def scrape_urls(urls, cfg=None):
     content = []
     user_agent = cfg.user_agent if cfg else "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0"
     try:
-        content = Scraper(urls, user_agent, cfg.scraper).run()
+        content = await Scraper(urls, user_agent, cfg.scraper, cfg, query=query).run()
     except Exception as e:
         print(f"{Fore.RED}Error in scrape_urls: {e}{Style.RESET_ALL}")
     return content
@@ -246,18 +230,20 @@ async def summarize_url(query, raw_data, agent_role_prompt, cfg):
                 {"role": "system", "content": f"{agent_role_prompt}"},
                 {"role": "user", "content": f"{generate_summary_prompt(query, raw_data)}"}],
             temperature=0,
-            llm_provider=cfg.llm_provider
+            llm_provider=cfg.llm_provider,
+            priority=Priority.BACKGROUND
         )
     except Exception as e:
         print(f"{Fore.RED}Error in summarize: {e}{Style.RESET_ALL}")
     return summary
 
-async def stream_output(type, output, websocket=None, logging=True):
+async def stream_output(type, output, websocket=None, logging=False):
     """
     Streams output to the websocket
     Args:
         type:
         output:
+        logging: also print the output when it goes to a websocket
 
     Returns:
         None
@@ -0,0 +1,97 @@
+import json
+from typing import Dict, List, Optional
+
+from backend.master.row_store import EMPTY_VALUE
+
+
+class JSONRowStreamParser:
+    """
+    Incremental parser for a streamed JSON completion containing row objects.
+    Each innermost object (no nested objects) is yielded as soon as its closing brace
+    arrives, so rows reach the client before the completion ends, and rows that were
+    complete before a truncated or malformed tail are kept.
+    """
+    def __init__(self, columns: Optional[List[str]] = None):
+        self.columns = list(columns) if columns else None
+        self.buffer = []
+        self.position = 0
+        self.in_string = False
+        self.escaped = False
+        # Stack of [start offset, contains a nested object, opening char] for each open container
+        self.stack = []
+        self.emitted = 0
+
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Consumes the next chunk of the stream
+        Returns:
+            list: rows completed by this chunk, validated against the columns
+        """
+        rows = []
+        for char in text:
+            self.buffer.append(char)
+            offset = self.position
+            self.position += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                if char == "{":
+                    for container in self.stack:
+                        container[1] = True
+                self.stack.append([offset, False, char])
+            elif char in "}]" and self.stack:
+                start, nested, opener = self.stack.pop()
+                if char == "}" and opener == "{" and not nested:
+                    row = self._parse_row("".join(self.buffer[start:offset + 1]))
+                    if row is not None:
+                        rows.append(row)
+        self.emitted += len(rows)
+        return rows
+
+    def _parse_row(self, text) -> Optional[Dict]:
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return self.validate(obj)
+
+    def validate(self, obj) -> Optional[Dict]:
+        """Keeps only objects that look like a row for the requested columns."""
+        if not isinstance(obj, dict) or not obj:
+            return None
+        if self.columns is None:
+            return obj
+        values = [obj[column] for column in self.columns if column in obj]
+        if not values or all(isinstance(v, list) for v in values):
+            # No known columns, or a column-oriented object that finish() handles
+            return None
+        return {
+            column: ", ".join(map(str, value)) if isinstance(value, list) else value
+            for column, value in ((c, obj.get(c, EMPTY_VALUE)) for c in self.columns)
+        }
+
+    def finish(self) -> List[Dict]:
+        """
+        Called once the stream ends. Nothing else to emit for row-oriented output, but a
+        column-oriented object ({"col": [v1, v2]}) only becomes usable once it is complete.
+        """
+        if self.emitted:
+            return []
+        text = "".join(self.buffer).strip().strip('```json').strip('```').strip()
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            return []
+        if isinstance(obj, dict) and obj and all(isinstance(v, list) for v in obj.values()):
+            length = max(len(v) for v in obj.values())
+            records = [{k: (v[i] if i < len(v) else EMPTY_VALUE) for k, v in obj.items()} for i in range(length)]
+            return [row for row in (self.validate(r) for r in records) if row is not None]
+        return []
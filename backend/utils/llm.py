@@ -1,17 +1,19 @@
 from __future__ import annotations
 
 import json
-import logging
 import asyncio
 import time
 import pandas as pd
 from io import StringIO
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 from colorama import Fore, Style
 from fastapi import WebSocket
 from langchain_openai import ChatOpenAI
 
+from .llm_cache import get_llm_cache
+from .tracing import annotate, estimate_text_tokens, get_tracer
+
 
 def get_provider(llm_provider):
     match llm_provider:
@@ -36,6 +38,9 @@ async def create_chat_completion(
     llm_provider: Optional[str] = None,
     stream: Optional[bool] = False,
     websocket: WebSocket | None = None,
+    cache: bool = True,
+    priority: Optional[int] = None,
+    on_chunk: Optional[Callable[[str], Awaitable[None]]] = None,
 ) -> str:
     """Create a chat completion using the OpenAI API
     Args:
@@ -46,6 +51,9 @@ async def create_chat_completion(
         stream (bool, optional): Whether to stream the response. Defaults to False.
         llm_provider (str, optional): The LLM Provider to use.
         webocket (WebSocket): The websocket used in the currect request
+        cache (bool, optional): Set to False to bypass the response cache. Only temperature 0 calls are cached.
+        priority (Priority, optional): Scheduling class, INTERACTIVE calls are admitted before BACKGROUND ones.
+        on_chunk (callable, optional): Coroutine called with each streamed text fragment.
     Returns:
         str: The response from the chat completion
     """
@@ -55,32 +63,79 @@ async def create_chat_completion(
     if max_tokens is not None and max_tokens > 8001:
         raise ValueError(
             f"Max tokens cannot be more than 8001, but got {max_tokens}")
-    # Get the provider from supported providers
-    ProviderClass = get_provider(llm_provider)
-    provider = ProviderClass(
-        model,
-        temperature,
-        max_tokens
-    )
-    # create response
-    for _ in range(10):  # maximum of 10 attempts
+    prompt_tokens = sum(estimate_text_tokens(m.get("content", "")) for m in messages)
+    with get_tracer().span("llm", provider=llm_provider, model=model, prompt_tokens=prompt_tokens) as span:
+        response = await _chat_completion(
+            messages, model, temperature, max_tokens, llm_provider, stream, websocket, cache, priority, on_chunk
+        )
+        span.set(completion_tokens=estimate_text_tokens(response))
+    return response
+
+
+async def _chat_completion(
+    messages, model, temperature, max_tokens, llm_provider, stream, websocket, cache, priority, on_chunk
+) -> str:
+    response_cache = get_llm_cache() if cache and temperature == 0 else None
+    if response_cache is not None:
+        scope = response_cache.scope(llm_provider, model, temperature, max_tokens)
+        cached = await asyncio.to_thread(response_cache.get, scope, messages)
+        annotate(cached=cached is not None)
+        if cached is not None:
+            if stream and websocket is not None:
+                await websocket.send_json({"type": "report", "output": cached})
+            if stream and on_chunk is not None:
+                await on_chunk(cached)
+            return cached
+
+    # Get a cached client for this provider/model from the process-wide registry
+    from ..llm_provider import Priority, estimate_tokens, get_llm_scheduler, get_provider_registry
+    provider = get_provider_registry().get(llm_provider, model, temperature, max_tokens)
+
+    # Once a fragment reached the client or the stream parser, a retry would send it twice
+    streamed = False
+
+    async def forward(chunk):
+        nonlocal streamed
+        streamed = True
+        if on_chunk is not None:
+            await on_chunk(chunk)
+
+    async def call():
         if llm_provider == "openai":
-            response = await provider.get_chat_response(
-                messages, stream, websocket
-            )
-        else:
-            model_response = await provider.get_chat_response(
-                messages, stream, websocket
+            return await provider.get_chat_response(
+                messages, stream, websocket, forward
             )
-            response = model_response.choices[0].message['content']
-        return response
-    logging.error("Failed to get response from OpenAI API")
-    raise RuntimeError("Failed to get response from OpenAI API")
+        model_response = await provider.get_chat_response(
+            messages, stream, websocket, forward
+        )
+        if isinstance(model_response, str):
+            return model_response
+        return model_response.choices[0].message['content']
+
+    # create response, rate limited and retried by the process-wide scheduler
+    try:
+        response = await get_llm_scheduler().submit(
+            llm_provider,
+            model,
+            call,
+            priority=Priority.DEFAULT if priority is None else priority,
+            tokens=estimate_tokens(messages, max_tokens),
+            can_retry=lambda: not streamed,
+        )
+    except Exception as e:
+        raise RuntimeError(f"Failed to get response from {llm_provider} API") from e
+    if response_cache is not None:
+        await asyncio.to_thread(response_cache.put, scope, messages, response)
+    return response
+
+def parse_json_response(output: str):
+    """Strips markdown code fences from a completion and loads it as JSON."""
+    output = output.strip().strip('```json').strip('```').strip()
+    return json.loads(output)
 
 async def parse_chat_completion_for_json(output: str | dict) -> pd.DataFrame:
     if isinstance(output, str):
-        output = output.strip('```json').strip('```').strip()
-        output_dict = json.loads(output)
+        output_dict = parse_json_response(output)
     else:
         output_dict = output
     
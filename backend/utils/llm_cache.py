@@ -0,0 +1,185 @@
+import hashlib
+import json
+import threading
+import time
+from contextlib import closing
+from typing import Optional
+
+import numpy as np
+
+from backend.context.similarity import normalize_rows, score
+from backend.utils.sqlite import SQLiteStore
+
+SEMANTIC_MAX_CHARS = 8000
+
+
+def messages_text(messages) -> str:
+    return "\n".join(f"{m.get('role')}: {m.get('content')}" for m in messages)
+
+
+def semantic_text(messages, max_chars=SEMANTIC_MAX_CHARS) -> str:
+    """
+    The prompt text that gets embedded: the head and tail of each message within an equal share of `max_chars`.
+    Row-specific values lead the gap-fill prompts and the shared context follows, so heads must not be cut.
+    """
+    share = max_chars // max(len(messages), 1)
+    parts = []
+    for m in messages:
+        content = str(m.get("content"))
+        if len(content) > share:
+            content = f"{content[:share // 2]}\n...\n{content[-(share // 2):]}"
+        parts.append(f"{m.get('role')}: {content}")
+    return "\n".join(parts)
+
+
+class LLMResponseCache(SQLiteStore):
+    """
+    Cache of chat completions, only used for deterministic (temperature 0) calls.
+    The exact tier is keyed on (provider, model, temperature, max_tokens, messages hash) and lives in SQLite.
+    The optional semantic tier embeds the prompt and returns a cached answer for the same
+    provider/model when a stored prompt is within the similarity threshold.
+    """
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS responses ("
+        "key TEXT PRIMARY KEY, scope TEXT NOT NULL, response TEXT NOT NULL, "
+        "prompt_vector BLOB, created_at REAL NOT NULL, last_access REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)",
+    )
+
+    def __init__(self, path, max_entries=10000, semantic=False, semantic_threshold=0.97, embeddings=None):
+        self.max_entries = max_entries
+        self.semantic = semantic and embeddings is not None
+        self.semantic_threshold = semantic_threshold
+        self.embeddings = embeddings
+        self.counters = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._semantic_keys = []
+        self._semantic_scopes = []
+        self._semantic_matrix = None
+        self._semantic_rowid = 0
+        super().__init__(path)
+
+    @staticmethod
+    def scope(llm_provider, model, temperature, max_tokens):
+        return f"{llm_provider}|{model}|{temperature}|{max_tokens}"
+
+    @staticmethod
+    def key(scope, messages):
+        payload = json.dumps(messages, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(f"{scope}\0{payload}".encode("utf-8")).hexdigest()
+
+    def _embed(self, messages):
+        return normalize_rows(self.embeddings.embed_query(semantic_text(messages)))
+
+    def _refresh_semantic(self, conn):
+        """
+        Syncs the in-memory prompt vectors with the table, including writes by other processes.
+        New rows are appended. Once rows were evicted or replaced, the vectors are reloaded from the surviving
+        rows, so the index stays bounded by `max_entries`.
+        """
+        stored = conn.execute("SELECT COUNT(*) FROM responses WHERE prompt_vector IS NOT NULL").fetchone()[0]
+        query = "SELECT rowid, key, scope, prompt_vector FROM responses WHERE rowid > ? AND prompt_vector IS NOT NULL"
+        rows = conn.execute(query, (self._semantic_rowid,)).fetchall()
+        if len(self._semantic_keys) + len(rows) != stored:
+            self._semantic_keys, self._semantic_scopes, self._semantic_matrix = [], [], None
+            self._semantic_rowid = 0
+            rows = conn.execute(query, (0,)).fetchall()
+        if not rows:
+            return
+        vectors = [np.frombuffer(row[3], dtype=np.float32) for row in rows]
+        self._semantic_keys.extend(row[1] for row in rows)
+        self._semantic_scopes.extend(row[2] for row in rows)
+        new = np.vstack(vectors)
+        self._semantic_matrix = new if self._semantic_matrix is None else np.vstack([self._semantic_matrix, new])
+        self._semantic_rowid = max(row[0] for row in rows)
+
+    def _fetch(self, conn, key):
+        row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0] if row else None
+
+    def get(self, scope, messages) -> Optional[str]:
+        key = self.key(scope, messages)
+        with self._lock, closing(self._connect()) as conn, conn:
+            response = self._fetch(conn, key)
+            if response is not None:
+                self.counters["exact_hits"] += 1
+                return response
+            if not self.semantic:
+                self.counters["misses"] += 1
+                return None
+
+        # Embed outside the lock, it is a provider round trip
+        query_vector = self._embed(messages)
+        with self._lock, closing(self._connect()) as conn, conn:
+            self._refresh_semantic(conn)
+            if self._semantic_matrix is not None:
+                scores = score(self._semantic_matrix, query_vector)
+                for i in np.argsort(-scores):
+                    if scores[i] < self.semantic_threshold:
+                        break
+                    if self._semantic_scopes[i] != scope:
+                        continue
+                    response = self._fetch(conn, self._semantic_keys[i])
+                    if response is not None:
+                        self.counters["semantic_hits"] += 1
+                        return response
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, scope, messages, response):
+        if not response:
+            return
+        vector = self._embed(messages).tobytes() if self.semantic else None
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, scope, response, prompt_vector, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.key(scope, messages), scope, response, vector, now, now),
+            )
+            self.counters["stores"] += 1
+            count = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                evicted = conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+                self.counters["evictions"] += evicted
+
+    def stats(self):
+        with closing(self._connect()) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return dict(self.counters, entries=entries)
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_configured = False
+
+
+def get_llm_cache(cfg=None) -> Optional[LLMResponseCache]:
+    """
+    Gets the process-wide response cache, or None when it is disabled
+    """
+    global _llm_cache, _llm_cache_configured
+    if not _llm_cache_configured:
+        if cfg is None:
+            from backend.config import Config
+            cfg = Config()
+        _llm_cache_configured = True
+        if not cfg.llm_cache:
+            return None
+        embeddings = None
+        if cfg.llm_cache_semantic:
+            from backend.memory import Memory
+            embeddings = Memory(cfg.embedding_provider).get_embeddings()
+        _llm_cache = LLMResponseCache(
+            cfg.llm_cache_path,
+            max_entries=cfg.llm_cache_max_entries,
+            semantic=cfg.llm_cache_semantic,
+            semantic_threshold=cfg.llm_cache_semantic_threshold,
+            embeddings=embeddings,
+        )
+    return _llm_cache
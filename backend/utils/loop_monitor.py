@@ -0,0 +1,117 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from colorama import Fore, Style
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag: how late a periodic sleep wakes up. Sustained lag means something is
+    running on the loop thread that should be in a worker thread or the CPU pool.
+
+    With a `block_threshold`, a watchdog thread also samples the loop thread's stack whenever the loop
+    has not come back for longer than that, so the blocking callback shows up in the logs.
+    """
+    def __init__(self, interval=0.1, window=600, block_threshold=None, max_stacks=20):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self.blocked = 0
+        self.stacks: Deque[Dict] = deque(maxlen=max_stacks)
+        self._beat = time.monotonic()
+        self._loop_thread_id = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._loop_thread_id = threading.get_ident()
+            self._beat = time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.block_threshold and self._watchdog is None:
+            self._stopped.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            self.record(max(loop.time() - expected, 0.0))
+
+    def _watch(self):
+        reported = None
+        while not self._stopped.wait(self.block_threshold / 2):
+            beat = self._beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.block_threshold or beat == reported:
+                continue
+            # One sample per blocking episode, taken while the loop thread is still stuck
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            self.blocked += 1
+            self.stacks.append({"at": time.time(), "blocked_ms": round(blocked_for * 1000, 1), "stack": stack})
+            print(f"{Fore.YELLOW}Event loop blocked for over {blocked_for * 1000:.0f} ms in:\n{stack}{Style.RESET_ALL}")
+
+    def record(self, lag):
+        self.samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            dict: lag in milliseconds over the recent window (last, mean, p99) and since start (max),
+                plus the number of blocking episodes and their latest stack samples
+        """
+        if not self.samples:
+            return {"samples": 0, "blocked": self.blocked, "stacks": list(self.stacks)}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "last_ms": round(self.samples[-1] * 1000, 2),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2),
+            "max_ms": round(self.max_lag * 1000, 2),
+            "blocked": self.blocked,
+            "stacks": list(self.stacks),
+        }
+
+    async def stop(self):
+        self._stopped.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_loop_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor(cfg=None) -> LoopLagMonitor:
+    """Gets the process-wide event loop lag monitor."""
+    global _loop_monitor
+    if _loop_monitor is None:
+        if cfg is None:
+            _loop_monitor = LoopLagMonitor()
+        else:
+            _loop_monitor = LoopLagMonitor(
+                interval=cfg.loop_lag_interval,
+                block_threshold=cfg.loop_block_threshold_ms / 1000 if cfg.loop_block_threshold_ms else None,
+            )
+    return _loop_monitor
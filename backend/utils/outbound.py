@@ -0,0 +1,153 @@
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Dict
+
+from colorama import Fore, Style
+
+# Message types whose consecutive fragments are joined into one frame, with their separator
+COALESCED_TYPES = {"logs": "\n", "report": ""}
+# Only progress logs may be merged away or dropped when the client falls behind
+SHEDDABLE_TYPES = ("logs",)
+
+
+class OutboundQueue:
+    """
+    Bounded queue of outbound messages for one consumer (a websocket, or a job's event log), drained by its own
+    sender task so a slow consumer never stalls whoever produces the messages.
+    Consecutive `logs`/`report` fragments are coalesced into a single frame on a short flush interval. Once
+    `maxsize` frames are pending, logs are merged into the newest pending log frame (log_policy="merge") or
+    dropped (log_policy="drop"), while every other message is always delivered, in order.
+    A failing consumer stops the queue (a closed websocket), unless `stop_on_error` is False (a job's event log):
+    then a failed log is dropped and every other message is retried until it is delivered.
+    """
+    RETRY_DELAYS = (0.1, 0.5, 1, 2, 5)
+
+    def __init__(
+        self,
+        send: Callable[[Dict], Awaitable],
+        maxsize=1000,
+        flush_interval=0.05,
+        log_policy="merge",
+        max_frame_chars=64000,
+        stop_on_error=True,
+    ):
+        self.send = send
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.log_policy = log_policy
+        self.max_frame_chars = max_frame_chars
+        self.stop_on_error = stop_on_error
+        self.pending = deque()
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.closed = False
+        self.task = None
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self._unreported_drops = 0
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+        return self
+
+    def put_nowait(self, message: Dict):
+        """Queues a message without ever waiting; only sheddable messages are affected by the bound."""
+        if self.closed:
+            return
+        kind = message.get("type")
+        if kind in COALESCED_TYPES and self._coalesce(self.pending[-1] if self.pending else None, message):
+            self.merged += 1
+        elif kind in SHEDDABLE_TYPES and len(self.pending) >= self.maxsize:
+            self._shed(message)
+        else:
+            self.pending.append(message)
+            if len(self.pending) >= self.maxsize:
+                self.space.clear()
+        self.ready.set()
+
+    async def put(self, message: Dict):
+        """Queues a message, waiting while the queue is full unless the message can be merged or shed."""
+        if message.get("type") not in SHEDDABLE_TYPES:
+            while len(self.pending) >= self.maxsize and not self.closed:
+                await self.space.wait()
+        self.put_nowait(message)
+
+    async def close(self, flush=True):
+        """Stops accepting messages and, unless flush is False, waits until the pending ones are sent."""
+        self.closed = True
+        self.ready.set()
+        if self.task is None:
+            return
+        if not flush:
+            self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {"pending": len(self.pending), "sent": self.sent, "merged": self.merged, "dropped": self.dropped}
+
+    def _coalesce(self, frame, message) -> bool:
+        """Appends the message's output to `frame` if both are plain fragments of the same type."""
+        if frame is None or frame.get("type") != message.get("type") or frame.keys() != {"type", "output"}:
+            return False
+        if message.keys() != {"type", "output"} or not isinstance(message["output"], str):
+            return False
+        if not isinstance(frame["output"], str) or len(frame["output"]) + len(message["output"]) > self.max_frame_chars:
+            return False
+        frame["output"] += COALESCED_TYPES[message["type"]] + message["output"]
+        return True
+
+    def _shed(self, message):
+        if self.log_policy == "merge":
+            for frame in reversed(self.pending):
+                if frame.get("type") == message.get("type"):
+                    if self._coalesce(frame, message):
+                        self.merged += 1
+                        return
+                    break
+        self.dropped += 1
+        self._unreported_drops += 1
+
+    async def _deliver(self, message) -> bool:
+        """Sends one message. Returns False when the queue has to stop."""
+        attempt = 0
+        while True:
+            try:
+                await self.send(message)
+                self.sent += 1
+                return True
+            except Exception as e:
+                if self.stop_on_error:
+                    print(f"{Fore.RED}Outbound queue stopped, consumer failed: {e}{Style.RESET_ALL}")
+                    return False
+                if message.get("type") in SHEDDABLE_TYPES:
+                    print(f"{Fore.RED}Dropped a log message, consumer failed: {e}{Style.RESET_ALL}")
+                    self.dropped += 1
+                    return True
+                delay = self.RETRY_DELAYS[min(attempt, len(self.RETRY_DELAYS) - 1)]
+                print(f"{Fore.RED}Failed to deliver a {message.get('type')} message, retrying in {delay}s: {e}{Style.RESET_ALL}")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def _run(self):
+        while True:
+            await self.ready.wait()
+            if self.pending and self.pending[0].get("type") in COALESCED_TYPES and not self.closed:
+                # Give the fragments that follow a moment to land in the same frame
+                await asyncio.sleep(self.flush_interval)
+            while self.pending:
+                message = self.pending.popleft()
+                if len(self.pending) < self.maxsize:
+                    self.space.set()
+                if self._unreported_drops and message.get("type") in SHEDDABLE_TYPES and isinstance(message.get("output"), str):
+                    message = {**message, "output": f"[{self._unreported_drops} log messages skipped]\n{message['output']}"}
+                    self._unreported_drops = 0
+                if not await self._deliver(message):
+                    self.closed = True
+                    self.pending.clear()
+                    self.space.set()
+                    return
+            if self.closed:
+                return
+            self.ready.clear()
@@ -0,0 +1,2 @@
+# Pages of a PDF are joined with a form feed, so page numbers survive the page cache and reach the chunks
+PAGE_SEPARATOR = "\f"
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+from contextlib import closing
+from typing import Tuple
+
+
+class SQLiteStore:
+    """
+    Base of the SQLite-backed stores. Creates the database in WAL mode with the subclass's `SCHEMA`
+    statements. Every call opens its own connection, so one store can be shared by threads and processes.
+    """
+    SCHEMA: Tuple[str, ...] = ()
+    # Seconds a connection waits for another writer before failing
+    BUSY_TIMEOUT = 30
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self, autocommit=False) -> sqlite3.Connection:
+        if autocommit:
+            # Transactions are managed explicitly (BEGIN IMMEDIATE) by the caller
+            return sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+        return sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT)
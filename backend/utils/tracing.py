@@ -0,0 +1,285 @@
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from colorama import Fore, Style
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Numeric attributes that are sizes or counts, summed per stage. Others (settings like `k`, loop indices,
+# gauges like `indexed`) stay on the exported spans only.
+ADDITIVE_ATTRIBUTES = frozenset({
+    "chars", "pages", "chunks", "rows", "queries", "results", "unique_urls", "planned", "candidates",
+    "added", "rejected", "groups", "missing_cells", "filled_cells", "prompt_tokens", "completion_tokens",
+    "hits", "cache_hits", "embedded",
+})
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage of a run, with its attributes (sizes, counts, token estimates) and parent stage."""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, parent: Optional["Span"] = None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def to_otlp(self) -> Dict:
+        """The span in OTLP/JSON form."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [otlp_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def otlp_attribute(key, value) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def annotate(**attributes):
+    """Sets attributes on the span of the current stage, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def estimate_text_tokens(text) -> int:
+    """Rough token count, the same 4 characters per token the LLM scheduler budgets with."""
+    return len(str(text or "")) // 4
+
+
+class StageStats:
+    __slots__ = ("count", "errors", "total", "buckets", "sums")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.sums: Dict[str, float] = defaultdict(float)
+
+
+class SpanFileExporter:
+    """
+    Appends finished spans to a file from a background thread, one OTLP/JSON `resourceSpans`
+    document per line (the layout of the OpenTelemetry collector's file exporter).
+    Each line is a single append, so the server and job worker processes can share the file.
+    Once the file grows past `max_bytes` it is moved to `<path>.1`, replacing the previous one.
+    """
+    def __init__(self, path, service_name="webscrape", batch_size=256, flush_interval=2.0, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def _run(self):
+        batch: List[Span] = []
+        running = True
+        while running:
+            try:
+                span = self._queue.get(timeout=self.flush_interval)
+                if span is None:
+                    running = False
+                else:
+                    batch.append(span)
+            except queue.Empty:
+                pass
+            if batch and (len(batch) >= self.batch_size or not running or self._queue.empty()):
+                self._write(batch)
+                batch = []
+
+    def _write(self, spans: List[Span]):
+        document = {"resourceSpans": [{
+            "resource": {"attributes": [otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "backend"}, "spans": [span.to_otlp() for span in spans]}],
+        }]}
+        try:
+            self._rotate()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, (json.dumps(document) + "\n").encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"{Fore.RED}Error writing spans to {self.path}: {e}{Style.RESET_ALL}")
+
+    def _rotate(self):
+        try:
+            if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            # Not written yet, or another process rotated it first
+            pass
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+class Tracer:
+    """
+    Records a span for each stage of a run: durations go to per-stage histograms, size and count
+    attributes (ADDITIVE_ATTRIBUTES) to per-stage totals, and finished spans to the exporter if there is one.
+    Spans nest through a context variable, so stages started in tasks and worker threads get their parent.
+    """
+    def __init__(self, exporter: Optional[SpanFileExporter] = None, enabled=True):
+        self.exporter = exporter
+        self.enabled = enabled
+        self.stages: Dict[str, StageStats] = defaultdict(StageStats)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Times the enclosed block as stage `name`
+        Args:
+            attributes: initial span attributes, more can be set on the yielded span or with `annotate`
+        """
+        if not self.enabled:
+            yield Span(name, attributes=attributes)
+            return
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            self.record(span)
+
+    def record(self, span: Span):
+        duration = span.duration
+        with self._lock:
+            stats = self.stages[span.name]
+            stats.count += 1
+            stats.total += duration
+            if span.error:
+                stats.errors += 1
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+            for key, value in span.attributes.items():
+                if key in ADDITIVE_ATTRIBUTES and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats.sums[key] += value
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                name: dict(count=s.count, errors=s.errors, total_s=round(s.total, 3), mean_s=round(s.total / s.count, 4), **s.sums)
+                for name, s in self.stages.items() if s.count
+            }
+
+    def prometheus(self, extra: Iterable[Tuple[str, str, str, float]] = ()) -> str:
+        """
+        Renders the stage metrics, plus `extra` (name, type, help, value) samples, in the Prometheus text format
+        """
+        lines = [
+            "# HELP webscrape_stage_duration_seconds Duration of each run stage.",
+            "# TYPE webscrape_stage_duration_seconds histogram",
+        ]
+        totals, errors = [], []
+        with self._lock:
+            for name, s in sorted(self.stages.items()):
+                for bound, count in zip(DURATION_BUCKETS, s.buckets):
+                    lines.append(f'webscrape_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'webscrape_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {s.count}')
+                lines.append(f'webscrape_stage_duration_seconds_sum{{stage="{name}"}} {s.total}')
+                lines.append(f'webscrape_stage_duration_seconds_count{{stage="{name}"}} {s.count}')
+                errors.append(f'webscrape_stage_errors_total{{stage="{name}"}} {s.errors}')
+                totals.extend(
+                    f'webscrape_stage_attribute_total{{stage="{name}",attribute="{key}"}} {value}'
+                    for key, value in sorted(s.sums.items())
+                )
+        lines += ["# HELP webscrape_stage_errors_total Stages that raised.", "# TYPE webscrape_stage_errors_total counter", *errors]
+        lines += [
+            "# HELP webscrape_stage_attribute_total Sum of each size or count span attribute (chars, rows, token estimates).",
+            "# TYPE webscrape_stage_attribute_total counter",
+            *totals,
+        ]
+        for name, kind, help_text, value in extra:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+            self.exporter = None
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer(cfg=None) -> Tracer:
+    """
+    Gets the process-wide tracer, exporting spans to the configured file if any
+    """
+    global _tracer
+    if _tracer is None:
+        if cfg is None:
+            from backend.config import Config
+            cfg = Config()
+        exporter = (
+            SpanFileExporter(cfg.trace_export_path, max_bytes=cfg.trace_export_max_bytes)
+            if cfg.tracing and cfg.trace_export_path else None
+        )
+        _tracer = Tracer(exporter, enabled=cfg.tracing)
+    return _tracer
+
+
+def close_tracer():
+    """Flushes the span exporter."""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
@@ -0,0 +1,79 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a url so that trivially different spellings share one cache key
+    Args:
+        url: url to normalize
+
+    Returns:
+        str: lowercased scheme/host, default ports and fragment dropped, query params sorted
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "ref_src", "ref_url", "cmpid", "ocid", "spm",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+MIRROR_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+AMP_SEGMENTS = ("amp", "amp.html")
+AMP_FLAG_VALUES = ("", "1", "true")
+
+
+def _is_amp_flag(key, value) -> bool:
+    return key.lower() == "amp" and value.lower() in AMP_FLAG_VALUES
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Identity key for deciding whether two urls point at the same document. Not meant to be fetched.
+    Beyond normalize_url: http and https are merged, www/mobile/AMP host prefixes, AMP path suffixes
+    ('/story/amp', '/story.amp'), '?amp=1', known tracking params and trailing slashes are dropped.
+    Args:
+        url: url to canonicalize
+
+    Returns:
+        str: canonical key, e.g. 'example.com/news/story?id=3'
+    """
+    parts = urlsplit(normalize_url(url))
+    host = parts.netloc
+    for prefix in MIRROR_HOST_PREFIXES:
+        if host.startswith(prefix) and host.count(".") > 1:
+            host = host[len(prefix):]
+            break
+    segments = [segment for segment in parts.path.split("/") if segment]
+    # Only as a suffix of a longer path: '/amp' alone is a page of its own
+    if len(segments) > 1 and segments[-1] in AMP_SEGMENTS:
+        segments = segments[:-1]
+    if segments and segments[-1].endswith(".amp") and len(segments[-1]) > len(".amp"):
+        segments[-1] = segments[-1][:-len(".amp")]
+    path = "/".join(segments)
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+        and not _is_amp_flag(key, value)
+    ])
+    return f"{host}/{path}" + (f"?{query}" if query else "")
+
+
+def is_mirror_url(url: str) -> bool:
+    """Whether a url is an http, mobile or AMP variant, which a canonical sibling should be preferred to."""
+    parts = urlsplit(url.strip().lower())
+    segments = [segment for segment in parts.path.split("/") if segment]
+    return (
+        parts.scheme == "http"
+        or parts.netloc.startswith(("m.", "mobile.", "amp."))
+        or (len(segments) > 1 and segments[-1] in AMP_SEGMENTS)
+        or (bool(segments) and segments[-1].endswith(".amp") and len(segments[-1]) > len(".amp"))
+        or any(_is_amp_flag(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True))
+    )
@@ -6,47 +6,66 @@ from typing import Dict, List
 from fastapi import WebSocket
 
 from backend.outputs import DataTable
+from backend.utils.outbound import OutboundQueue
 
 
 class WebSocketManager:
     """Manage websockets"""
-    def __init__(self):
+    def __init__(self, queue_size=1000, flush_interval=0.05, log_policy="merge"):
         """Initialize the WebSocketManager class."""
         self.active_connections: List[WebSocket] = []
-        self.sender_tasks: Dict[WebSocket, asyncio.Task] = {}
-        self.message_queues: Dict[WebSocket, asyncio.Queue] = {}
-
-    async def start_sender(self, websocket: WebSocket):
-        """Start the sender task."""
-        queue = self.message_queues.get(websocket)
-        if not queue:
-            return
-
-        while True:
-            message = await queue.get()
-            if websocket in self.active_connections:
-                try:
-                    await websocket.send_text(message)
-                except:
-                    break
-            else:
-                break
+        self.message_queues: Dict[WebSocket, OutboundQueue] = {}
+        self.job_tasks: Dict[WebSocket, Dict[str, asyncio.Task]] = {}
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.log_policy = log_policy
 
     async def connect(self, websocket: WebSocket):
         """Connect a websocket."""
         await websocket.accept()
         self.active_connections.append(websocket)
-        self.message_queues[websocket] = asyncio.Queue()
-        self.sender_tasks[websocket] = asyncio.create_task(self.start_sender(websocket))
+        # Everything sent to the client goes through this queue, drained by its own sender task
+        self.message_queues[websocket] = OutboundQueue(
+            websocket.send_json,
+            maxsize=self.queue_size,
+            flush_interval=self.flush_interval,
+            log_policy=self.log_policy,
+        ).start()
 
     async def disconnect(self, websocket: WebSocket):
         """Disconnect a websocket."""
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
-            self.sender_tasks[websocket].cancel()
-            await self.message_queues[websocket].put(None)
-            del self.sender_tasks[websocket]
-            del self.message_queues[websocket]
+            await self.message_queues.pop(websocket).close(flush=False)
+        # Jobs keep running without the socket, only the forwarding stops
+        for task in self.job_tasks.pop(websocket, {}).values():
+            task.cancel()
+
+    def send(self, websocket: WebSocket, message):
+        """Queue a message for a websocket without waiting for the client."""
+        queue = self.message_queues.get(websocket)
+        if queue:
+            queue.put_nowait(message)
+
+    def stats(self):
+        """Outbound queue counters per connection."""
+        return [queue.stats() for queue in self.message_queues.values()]
+
+    async def attach_job(self, websocket: WebSocket, job_queue, job_id):
+        """Forward a job's events (replayed from the start) to a websocket."""
+        tasks = self.job_tasks.setdefault(websocket, {})
+        if job_id in tasks and not tasks[job_id].done():
+            return
+
+        async def forward():
+            queue = self.message_queues.get(websocket)
+            async for event in job_queue.subscribe(job_id):
+                if queue is None or queue.closed:
+                    return
+                # Waits while the client is behind, the job itself keeps running
+                await queue.put(event)
+
+        tasks[job_id] = asyncio.create_task(forward())
 
     async def start_streaming(self, task, columns, rows, websocket):
         """Start streaming the output."""
@@ -54,10 +73,9 @@ class WebSocketManager:
         return dataset
 
 
-async def iter_curate(task, columns, rows, websocket):
-    """Run the scrape"""
+async def iter_curate(task, columns, rows, websocket, session_id=None, context_mode=None):
+    """Run the scrape, resuming from the checkpoints of `session_id` if it was interrupted"""
     start_time = datetime.datetime.now()
-    print(f'stream start cols: {columns}')
 
     config_path = None
     researcher = DataTable(
@@ -66,7 +84,9 @@ async def iter_curate(task, columns, rows, websocket):
         columns=columns, 
         rows=rows,
         config_path=config_path, 
-        websocket=websocket
+        websocket=websocket,
+        session_id=session_id,
+        context_mode=context_mode
     )
     dataset = await researcher.run()
 
@@ -75,6 +95,4 @@ async def iter_curate(task, columns, rows, websocket):
 
     end_time = datetime.datetime.now()
     await websocket.send_json({"type": "logs", "output": f"\nTotal run time: {end_time - start_time}\n"})
-
-    print(f'Dataset: {dataset_json}')
     return dataset_json